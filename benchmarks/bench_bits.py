@@ -0,0 +1,55 @@
+# Microbenchmark for text <-> bit conversion.
+#
+# Compares the original list-based text_to_bits / bits_to_text with the
+# NumPy packbits/unpackbits helpers in lib_stegano.payload for messages from
+# 100 B to 1 MB, and reports the memory held by the bit representation.
+#
+#   python benchmarks/bench_bits.py --sizes 100 10000 1000000
+
+import argparse
+import sys
+
+from common import timed
+from lib_stegano import payload
+
+
+def legacy_text_to_bits(text):
+    bit_list = []
+    for char in text:
+        bits = bin(ord(char))[2:].zfill(8)
+        bit_list.extend([int(bit) for bit in bits])
+    return bit_list
+
+
+def legacy_bits_to_text(bits):
+    chars = []
+    for b in range(len(bits) // 8):
+        byte = bits[b*8:(b+1)*8]
+        byte_str = ''.join([str(bit) for bit in byte])
+        chars.append(chr(int(byte_str, 2)))
+    return ''.join(chars)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark text/bit conversion.")
+    parser.add_argument("--sizes", type=int, nargs="+", default=[100, 1000, 10000, 100000, 1000000])
+    args = parser.parse_args()
+
+    print(f"{'bytes':>9}{'to bits ms':>24}{'to text ms':>24}{'bit memory':>24}")
+    for size in args.sizes:
+        text = ("Steps: 20, Sampler: Euler a, CFG scale: 7, " * (size // 43 + 1))[:size]
+        old_bits, old_encode = timed(legacy_text_to_bits, text)
+        old_text, old_decode = timed(legacy_bits_to_text, old_bits)
+        new_bits, new_encode = timed(payload.text_to_bits, text)
+        new_text, new_decode = timed(lambda bits: payload.from_bits(bits).decode('utf-8'), new_bits)
+        assert old_text == new_text == text
+        assert old_bits == new_bits.tolist()
+        # A list holds one 8 byte pointer per bit (the int objects are cached)
+        old_memory = sys.getsizeof(old_bits)
+        print(f"{size:>9}{old_encode * 1000:>12.2f} ->{new_encode * 1000:>8.3f}"
+              f"{old_decode * 1000:>14.2f} ->{new_decode * 1000:>8.3f}"
+              f"{old_memory / 1024:>14.0f} KiB ->{new_bits.nbytes / 1024:>6.0f} KiB")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,83 @@
+# Compressed payload benchmark.
+#
+# Embeds typical A1111 geninfo payloads with and without compression and
+# reports the compression ratio, the number of embedded bits and the embed +
+# extract time per image. PNG runs on an in-memory image; JPEG runs on
+# synthetic DCT coefficient arrays, so jpeg_toolbox is not needed.
+#
+#   python benchmarks/bench_compress.py --size 2048 --repeat 5
+
+import argparse
+import time
+
+import numpy as np
+from PIL import Image
+
+from common import synthetic_jpeg
+from lib_stegano import jpeg, payload, pixels
+
+SAMPLES = {
+    "short": "a cat sitting on a windowsill\nSteps: 20, Sampler: Euler a, CFG scale: 7, Seed: 1234, "
+             "Size: 512x512, Model hash: 6ce0161689, Model: v1-5-pruned-emaonly, Version: v1.10.1",
+    "hires": "masterpiece, best quality, 1girl, solo, long hair, looking at viewer, smile, city street at night, "
+             "neon lights, rain, <lora:add_detail:0.6>\n"
+             "Negative prompt: (worst quality, low quality:1.4), lowres, bad anatomy, bad hands, text, error, "
+             "missing fingers, extra digit, fewer digits, cropped, jpeg artifacts, signature, watermark, blurry\n"
+             "Steps: 30, Sampler: DPM++ 2M Karras, Schedule type: Karras, CFG scale: 7, Seed: 3141592653, "
+             "Size: 832x1216, Model hash: 31e35c80fc, Model: sd_xl_base_1.0, Denoising strength: 0.4, "
+             "Clip skip: 2, Hires upscale: 2, Hires steps: 15, Hires upscaler: 4x-UltraSharp, "
+             "Lora hashes: \"add_detail: 7c6bad76eb54\", Version: v1.10.1",
+    "adetailer": "portrait photo of an old fisherman, detailed skin, 8k, photorealistic\n"
+                 "Negative prompt: deformed, disfigured, ugly, blurry, watermark\n"
+                 "Steps: 25, Sampler: DPM++ SDE Karras, CFG scale: 6, Seed: 42, Size: 768x768, "
+                 "Model hash: e6bb9ea85b, Model: realisticVision, ADetailer model: face_yolov8n.pt, "
+                 "ADetailer confidence: 0.3, ADetailer dilate erode: 4, ADetailer mask blur: 4, "
+                 "ADetailer denoising strength: 0.4, ADetailer inpaint only masked: True, "
+                 "ADetailer inpaint padding: 32, ADetailer version: 24.9.0, Version: v1.10.1",
+}
+
+
+def best_time(func, repeat):
+    best = None
+    for _ in range(repeat):
+        start = time.perf_counter()
+        func()
+        elapsed = time.perf_counter() - start
+        best = elapsed if best is None else min(best, elapsed)
+    return best
+
+
+def png_round_trip(img, message, compress):
+    embedded = pixels.embed(img.copy(), message, 7, compress=compress)
+    assert pixels.extract(embedded, 7) == message
+
+
+def jpeg_round_trip(arrays, message, compress):
+    img = {"coef_arrays": [a.copy() for a in arrays]}
+    jpeg.hide(img, 7, message, compress)
+    assert jpeg.unhide(img, 7) == message
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark compressed payloads.")
+    parser.add_argument("--size", type=int, default=2048)
+    parser.add_argument("--repeat", type=int, default=5)
+    args = parser.parse_args()
+
+    rng = np.random.default_rng(0)
+    img = Image.fromarray(rng.integers(0, 256, (args.size, args.size, 3), dtype=np.uint8))
+    arrays = synthetic_jpeg(args.size, 0)
+
+    print(f"{'sample':<10}{'bytes':>7}{'packed':>8}{'ratio':>7}{'bits saved':>12}"
+          f"{'png ms':>16}{'jpeg ms':>18}")
+    for name, message in SAMPLES.items():
+        plain = len(payload.encode(message))
+        packed = len(payload.encode(message, compress_payload=True))
+        png = [best_time(lambda: png_round_trip(img, message, c), args.repeat) * 1000 for c in (False, True)]
+        jpg = [best_time(lambda: jpeg_round_trip(arrays, message, c), args.repeat) * 1000 for c in (False, True)]
+        print(f"{name:<10}{plain:>7}{packed:>8}{plain / packed:>7.2f}{8 * (plain - packed):>12}"
+              f"{png[0]:>8.1f} ->{png[1]:>6.1f}{jpg[0]:>10.1f} ->{jpg[1]:>6.1f}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,91 @@
+# Concurrent hide/reveal stress test.
+#
+# Runs many hide + reveal round trips on a thread pool: PNG in keyed and
+# legacy (random.shuffle) order, JPEG in keyed order on synthetic DCT
+# coefficients (jpeg_toolbox is not needed), and the legacy JPEG
+# coefficient shuffle checked against orders computed up front. Every job
+# uses its own seed and message, so two calls interleaving on shared random
+# state would show up as a failed round trip. Reports the throughput for
+# each number of workers and its speedup over one worker; the speedup is
+# bounded by the number of CPUs and by the parts that hold the GIL, such as
+# the pure Python legacy shuffle.
+#
+#   python benchmarks/bench_concurrency.py --jobs 64 --workers 1 2 4 8
+
+import argparse
+import os
+import sys
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+import numpy as np
+from PIL import Image
+
+from common import synthetic_jpeg
+from lib_stegano import jpeg, pixels
+
+
+def png_job(seed, legacy, size):
+    rng = np.random.default_rng(seed)
+    img = Image.fromarray(rng.integers(0, 256, (size, size, 3), dtype=np.uint8))
+    message = f"job {seed}: " + "x" * int(rng.integers(10, 200))
+    img = pixels.embed(img, message, seed, legacy=legacy)
+    return pixels.extract(img, seed) == message
+
+
+def jpeg_job(seed, size):
+    rng = np.random.default_rng(seed)
+    img = {"coef_arrays": synthetic_jpeg(size, seed)}
+    message = f"job {seed}: " + "y" * int(rng.integers(10, 200))
+    jpeg.hide(img, seed, message)
+    return jpeg.unhide(img, seed, legacy=False) == message
+
+
+def shuffle_job(seed, idx, expected):
+    return np.array_equal(jpeg.shuffled_indices(idx.copy(), seed), expected)
+
+
+def jobs(count, size):
+    """Return (name, func, args) for count mixed jobs."""
+    idx = np.arange(size * size // 4)
+    result = []
+    for seed in range(count):
+        kind = seed % 4
+        if kind == 0:
+            result.append(("png keyed", png_job, (seed, False, size)))
+        elif kind == 1:
+            result.append(("png legacy", png_job, (seed, True, size // 2)))
+        elif kind == 2:
+            result.append(("jpeg keyed", jpeg_job, (seed, size)))
+        else:
+            expected = jpeg.shuffled_indices(idx.copy(), seed)
+            result.append(("jpeg shuffle", shuffle_job, (seed, idx, expected)))
+    return result
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Stress concurrent hide/reveal round trips.")
+    parser.add_argument("--jobs", type=int, default=64)
+    parser.add_argument("--workers", type=int, nargs="+", default=[1, 2, 4, 8])
+    parser.add_argument("--size", type=int, default=512)
+    args = parser.parse_args()
+
+    work = jobs(args.jobs, args.size)
+    print(f"{os.cpu_count()} CPUs, {len(work)} jobs")
+    print(f"{'workers':>8}{'seconds':>9}{'jobs/s':>8}{'speedup':>9}  failures")
+    base = None
+    failed_any = False
+    for workers in args.workers:
+        start = time.perf_counter()
+        with ThreadPoolExecutor(max_workers=workers) as pool:
+            results = list(pool.map(lambda job: job[1](*job[2]), work))
+        seconds = time.perf_counter() - start
+        base = base or seconds
+        failures = sorted({name for (name, _, _), ok in zip(work, results) if not ok})
+        failed_any |= bool(failures)
+        print(f"{workers:>8}{seconds:>9.2f}{len(work) / seconds:>8.1f}{base / seconds:>9.2f}  {', '.join(failures) or 'none'}")
+    return 1 if failed_any else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,49 @@
+# Import-time benchmark for the shared core.
+#
+# Measures a fresh interpreter importing lib_stegano.core against importing
+# the modules the scripts used to load at import time (gradio, jpeg_toolbox,
+# PIL, NumPy). Modules that are not installed are skipped and reported.
+#
+#   python benchmarks/bench_import.py --runs 10
+
+import argparse
+import importlib.util
+import os
+import statistics
+import subprocess
+import sys
+import time
+
+ROOT = os.path.join(os.path.dirname(os.path.abspath(__file__)), "..")
+
+LEGACY_IMPORTS = ["gradio", "jpeg_toolbox", "PIL.Image", "PIL.PngImagePlugin", "numpy"]
+
+
+def import_time(statement, runs):
+    """Median wall time of python -c statement, minus an empty interpreter."""
+    def run(code):
+        start = time.perf_counter()
+        subprocess.run([sys.executable, "-c", code], cwd=ROOT, check=True)
+        return time.perf_counter() - start
+
+    empty = statistics.median(run("pass") for _ in range(runs))
+    return statistics.median(run(statement) for _ in range(runs)) - empty
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark import time of the stegano core.")
+    parser.add_argument("--runs", type=int, default=10)
+    args = parser.parse_args()
+
+    available = [name for name in LEGACY_IMPORTS if importlib.util.find_spec(name.split(".")[0])]
+    missing = sorted(set(LEGACY_IMPORTS) - set(available))
+    legacy = import_time("import " + ", ".join(available), args.runs)
+    core = import_time("import lib_stegano.core", args.runs)
+    print(f"{'legacy script imports':<24}{legacy * 1000:8.1f} ms  ({', '.join(available)})")
+    print(f"{'lib_stegano.core':<24}{core * 1000:8.1f} ms")
+    if missing:
+        print(f"not installed, left out of the legacy figure: {', '.join(missing)}")
+
+
+if __name__ == "__main__":
+    main()
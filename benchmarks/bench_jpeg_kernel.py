@@ -0,0 +1,76 @@
+# Keyed JPEG LSB kernel benchmark.
+#
+# Hides a geninfo sized message in synthetic DCT coefficient arrays (4:2:0,
+# so jpeg_toolbox is not needed) with the previous kernel, which
+# concatenated the arrays and built the index of every usable coefficient,
+# and with jpeg.hide in normal and low-memory mode. Reports the time and the
+# peak of the memory allocated on top of the coefficients (tracemalloc, which
+# sees NumPy buffers), and checks that all kernels write the same
+# coefficients and that the message reads back.
+#
+#   python benchmarks/bench_jpeg_kernel.py --sizes 2048 4096 8192
+
+import argparse
+import time
+import tracemalloc
+
+import numpy as np
+
+from common import GENINFO as MESSAGE, synthetic_jpeg
+from lib_stegano import jpeg, payload
+from lib_stegano.permutation import KeyedPermutation
+
+def reference_hide(img, seed, message):
+    """jpeg.hide before the in-place kernel."""
+    bits = payload.to_bits(payload.encode(message))
+    arrays = img["coef_arrays"]
+    idx = jpeg.component_indices(arrays)
+    idx = idx[KeyedPermutation(len(idx), seed)[:len(bits)]]
+    dct = np.concatenate([a.ravel() for a in arrays])
+    msg = np.asarray(bits)
+    dct[idx] = np.sign(dct[idx]) * (np.abs(dct[idx]) - np.abs(dct[idx] % 2))
+    dct[idx] = np.sign(dct[idx]) * (np.abs(dct[idx]) + msg)
+    offset = 0
+    for i, a in enumerate(arrays):
+        arrays[i] = dct[offset:offset + a.size].reshape(a.shape).astype(a.dtype, copy=False)
+        offset += a.size
+    return img
+
+
+def measure(func, arrays):
+    img = {"coef_arrays": [a.copy() for a in arrays]}
+    tracemalloc.start()
+    start = time.perf_counter()
+    func(img)
+    seconds = time.perf_counter() - start
+    _, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    return img, seconds, peak
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark the keyed JPEG LSB kernel.")
+    parser.add_argument("--sizes", type=int, nargs="+", default=[2048, 4096, 8192])
+    parser.add_argument("--seed", type=int, default=42)
+    args = parser.parse_args()
+
+    kernels = [("previous", lambda img: reference_hide(img, args.seed, MESSAGE)),
+               ("in place", lambda img: jpeg.hide(img, args.seed, MESSAGE)),
+               ("low memory", lambda img: jpeg.hide(img, args.seed, MESSAGE, low_memory=True))]
+    print(f"{'size':>6}{'coef MiB':>10}  {'kernel':<12}{'hide ms':>9}{'peak MiB':>10}")
+    for size in args.sizes:
+        arrays = synthetic_jpeg(size)
+        coef_mib = sum(a.nbytes for a in arrays) / 2 ** 20
+        expected = None
+        for name, kernel in kernels:
+            img, seconds, peak = measure(kernel, arrays)
+            if expected is None:
+                expected = img["coef_arrays"]
+            assert all(np.array_equal(a, b) for a, b in zip(expected, img["coef_arrays"])), name
+            assert jpeg.unhide(img, args.seed, legacy=False, low_memory=True) == MESSAGE, name
+            print(f"{size:>6}{coef_mib:>10.0f}  {name:<12}{seconds * 1000:>9.0f}{peak / 2 ** 20:>10.1f}")
+            del img
+
+
+if __name__ == "__main__":
+    main()
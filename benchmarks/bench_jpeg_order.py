@@ -0,0 +1,46 @@
+# JPEG coefficient selection benchmark.
+#
+# Compares the legacy random.shuffle order of the usable coefficients with the
+# keyed permutation, which only evaluates the positions the payload uses. Runs
+# on synthetic DCT coefficient arrays, so jpeg_toolbox is not needed, and
+# checks that every order round trips.
+#
+#   python benchmarks/bench_jpeg_order.py --sizes 1024 2048 4096
+
+import argparse
+
+from common import synthetic_jpeg, timed
+from lib_stegano import jpeg, payload
+from lib_stegano.permutation import KeyedPermutation
+
+
+def keyed_indices(idx, seed, count):
+    """The first count usable coefficients in keyed order, selected from the full index."""
+    return idx[KeyedPermutation(len(idx), seed)[:count]]
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark JPEG coefficient selection.")
+    parser.add_argument("--sizes", type=int, nargs="+", default=[1024, 2048, 4096])
+    parser.add_argument("--message-length", type=int, default=2000)
+    parser.add_argument("--seed", type=int, default=42)
+    args = parser.parse_args()
+
+    message = ("Steps: 20, Sampler: Euler a, CFG scale: 7, " * (args.message_length // 43 + 1))[:args.message_length]
+    bits = len(payload.to_bits(payload.encode(message)))
+    print(f"{'size':>6}{'candidates':>12}{'shuffle ms':>12}{'keyed ms':>10}{'hide ms':>10}{'unhide ms':>11}")
+    for size in args.sizes:
+        arrays = synthetic_jpeg(size)
+        idx = jpeg.component_indices(arrays)
+        _, shuffle_time = timed(jpeg.shuffled_indices, idx.copy(), args.seed)
+        _, keyed_time = timed(keyed_indices, idx, args.seed, bits)
+        img = {"coef_arrays": [a.copy() for a in arrays]}
+        _, hide_time = timed(jpeg.hide, img, args.seed, message)
+        extracted, unhide_time = timed(jpeg.unhide, img, args.seed)
+        assert extracted == message
+        print(f"{size:>6}{len(idx):>12}{shuffle_time * 1000:>12.1f}{keyed_time * 1000:>10.2f}"
+              f"{hide_time * 1000:>10.1f}{unhide_time * 1000:>11.1f}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,50 @@
+# Lossless format benchmark for the pixel engine.
+#
+# Embeds a geninfo sized message in a synthetic photo-like image, writes it as
+# PNG (several zlib levels) and lossless WebP, and reports the encode time and
+# file size of each. Every file is read back and must reveal the message.
+#
+#   python benchmarks/bench_lossless.py --sizes 1024 2048
+
+import argparse
+import os
+import tempfile
+import time
+
+from common import GENINFO as MESSAGE, photo_image
+from lib_stegano import core
+
+def writers():
+    yield "png level 1", ".png", lambda img, path: core.save_png(img, path, compress_level=1)
+    yield "png level 6", ".png", lambda img, path: core.save_png(img, path)
+    yield "png level 9", ".png", lambda img, path: core.save_png(img, path, compress_level=9)
+    yield "webp effort 0", ".webp", core.save_lossless
+    yield "webp effort 80", ".webp", lambda img, path: core.save_lossless(img, path, webp_effort=80)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark lossless formats for the pixel engine.")
+    parser.add_argument("--sizes", type=int, nargs="+", default=[1024, 2048])
+    parser.add_argument("--seed", type=int, default=42)
+    args = parser.parse_args()
+
+    print(f"{'size':>6}  {'format':<15}{'encode ms':>10}{'size KiB':>10}{'reveal ms':>11}")
+    with tempfile.TemporaryDirectory() as workdir:
+        for size in args.sizes:
+            stamped = core.png_embed_image(photo_image(size), MESSAGE, args.seed)
+            for name, ext, write in writers():
+                path = os.path.join(workdir, f"image_{size}{ext}")
+                start = time.perf_counter()
+                write(stamped, path)
+                encode = time.perf_counter() - start
+                start = time.perf_counter()
+                extracted = core.png_extract_file(path, args.seed)
+                reveal = time.perf_counter() - start
+                if extracted != MESSAGE:
+                    raise AssertionError(f"{name} lost the message at {size}x{size}")
+                print(f"{size:>6}  {name:<15}{encode * 1000:>10.1f}{os.path.getsize(path) / 1024:>10.0f}"
+                      f"{reveal * 1000:>11.1f}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,64 @@
+# Peak memory of the pixel engine against image size.
+#
+# Each case runs in a fresh interpreter: the image is created in memory (as
+# the WebUI hands it to the before-save callback), a geninfo sized message is
+# embedded and verified, and the peak RSS on top of the decoded image is
+# reported for the array path and the low-memory path.
+#
+#   python benchmarks/bench_memory.py --sizes 2048 4096 8192
+
+import argparse
+import json
+import os
+import subprocess
+import sys
+import time
+
+HERE = os.path.dirname(os.path.abspath(__file__))
+sys.path.insert(0, os.path.join(HERE, ".."))
+sys.path.insert(0, HERE)
+
+MESSAGE = "Steps: 30, Sampler: DPM++ 2M Karras, CFG scale: 7, Seed: 3141592653, " * 20
+
+
+def run_case(size, low_memory):
+    from PIL import Image
+    from lib_stegano import core
+    from suite import peak_rss_kb, reset_peak_rss
+    img = Image.new("RGB", (size, size), (120, 80, 200))
+    img.load()
+    core.low_memory = low_memory
+    reset = reset_peak_rss()
+    base = peak_rss_kb(reset)
+    start = time.perf_counter()
+    stamped = core.png_embed_image(img, MESSAGE, 7)
+    assert core.verify_png(stamped, MESSAGE, 7, log=lambda *args: None)
+    seconds = time.perf_counter() - start
+    return {"seconds": seconds, "extra_kb": peak_rss_kb(reset) - base}
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark pixel engine memory against image size.")
+    parser.add_argument("--sizes", type=int, nargs="+", default=[2048, 4096, 8192])
+    parser.add_argument("--run-case", help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.run_case:
+        size, low_memory = json.loads(args.run_case)
+        print(json.dumps(run_case(size, low_memory)))
+        return
+
+    print(f"{'size':>6}{'image MiB':>11}{'array extra MiB':>17}{'ms':>8}{'low-memory extra MiB':>22}{'ms':>8}")
+    for size in args.sizes:
+        results = []
+        for low_memory in (False, True):
+            proc = subprocess.run([sys.executable, __file__, "--run-case", json.dumps([size, low_memory])],
+                                  capture_output=True, text=True, check=True)
+            results.append(json.loads(proc.stdout))
+        array, sparse = results
+        print(f"{size:>6}{size * size * 4 / 2 ** 20:>11.0f}{array['extra_kb'] / 1024:>17.1f}{array['seconds'] * 1000:>8.0f}"
+              f"{sparse['extra_kb'] / 1024:>22.1f}{sparse['seconds'] * 1000:>8.0f}")
+
+
+if __name__ == "__main__":
+    main()
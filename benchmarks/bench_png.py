@@ -0,0 +1,123 @@
+# Before/after benchmark for the PNG embed_message / extract_message path.
+#
+# Compares the original per-pixel getpixel/putpixel implementation with the
+# vectorized engine in lib_stegano.pixels, and checks that both write
+# byte-identical files for the same seed and message when the engine uses the
+# legacy pixel order. The keyed (default) pixel order is timed as well.
+#
+#   python benchmarks/bench_png.py --sizes 512 1024 2048
+
+import argparse
+import os
+import random
+import tempfile
+
+import numpy as np
+from PIL import Image
+
+from common import timed
+from lib_stegano import pixels
+
+
+def legacy_get_pixel_order(width, height, seed):
+    pixels = [(x, y) for x in range(width) for y in range(height)]
+    random.seed(seed)
+    random.shuffle(pixels)
+    return pixels
+
+
+def legacy_embed_message(image_path, message, seed):
+    img = Image.open(image_path)
+    width, height = img.size
+    if img.mode != 'RGB':
+        img = img.convert('RGB')
+    message += '\0'
+    binary_message = ''.join(format(ord(char), '08b') for char in message)
+    pixels = legacy_get_pixel_order(width, height, seed)
+    data_index = 0
+    for x, y in pixels:
+        pixel = list(img.getpixel((x, y)))
+        for color_channel in range(3):
+            if data_index < len(binary_message):
+                pixel[color_channel] = (pixel[color_channel] & 0xFE) | int(binary_message[data_index])
+                data_index += 1
+        img.putpixel((x, y), tuple(pixel))
+        if data_index >= len(binary_message):
+            break
+    img.save(image_path)
+
+
+def legacy_extract_message(image_path, seed):
+    img = Image.open(image_path)
+    width, height = img.size
+    pixels = legacy_get_pixel_order(width, height, seed)
+    binary_message = ""
+    extracted_message = ""
+    for x, y in pixels:
+        pixel = img.getpixel((x, y))
+        for color_channel in range(3):
+            binary_message += str(pixel[color_channel] & 1)
+            if len(binary_message) == 8:
+                char = chr(int(binary_message, 2))
+                if char == '\0':
+                    return extracted_message
+                extracted_message += char
+                binary_message = ""
+    return extracted_message
+
+
+def engine_legacy_embed_message(image_path, message, seed):
+    pixels.embed(Image.open(image_path), message, seed, legacy=True).save(image_path)
+
+
+def engine_embed_message(image_path, message, seed):
+    pixels.embed(Image.open(image_path), message, seed).save(image_path)
+
+
+def engine_extract_message(image_path, seed):
+    return pixels.extract(Image.open(image_path), seed)
+
+
+def run(size, message, seed, workdir):
+    source = os.path.join(workdir, f"source_{size}.png")
+    rng = np.random.default_rng(size)
+    Image.fromarray(rng.integers(0, 256, (size, size, 3), dtype=np.uint8)).save(source)
+
+    results = {}
+    for name, embed, extract in (("legacy", legacy_embed_message, legacy_extract_message),
+                                 ("engine", engine_legacy_embed_message, engine_extract_message),
+                                 ("keyed", engine_embed_message, engine_extract_message)):
+        path = os.path.join(workdir, f"{name}_{size}.png")
+        with open(source, "rb") as src, open(path, "wb") as dst:
+            dst.write(src.read())
+        _, embed_time = timed(embed, path, message, seed)
+        extracted, extract_time = timed(extract, path, seed)
+        if extracted != message:
+            raise AssertionError(f"{name} round trip failed at {size}x{size}")
+        with open(path, "rb") as f:
+            results[name] = (f.read(), embed_time, extract_time)
+
+    identical = results["legacy"][0] == results["engine"][0]
+    print(f"{size}x{size}  embed {results['legacy'][1]:8.3f}s -> {results['engine'][1]:8.3f}s  "
+          f"extract {results['legacy'][2]:8.3f}s -> {results['engine'][2]:8.3f}s  "
+          f"identical={identical}  keyed embed {results['keyed'][1]:8.3f}s extract {results['keyed'][2]:8.3f}s")
+    if not identical:
+        raise AssertionError(f"output differs at {size}x{size}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark the PNG embed/extract engine.")
+    parser.add_argument("--sizes", type=int, nargs="+", default=[512, 1024, 2048])
+    parser.add_argument("--message-length", type=int, default=2000)
+    parser.add_argument("--seed", type=int, default=42)
+    args = parser.parse_args()
+
+    rng = random.Random(args.seed)
+    message = ''.join(chr(rng.randint(32, 126)) for _ in range(args.message_length))
+    with tempfile.TemporaryDirectory() as workdir:
+        for size in args.sizes:
+            run(size, message, args.seed, workdir)
+
+
+if __name__ == "__main__":
+    main()
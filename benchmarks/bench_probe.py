@@ -0,0 +1,60 @@
+# Payload-presence probe benchmark.
+#
+# Times scan.probe_file, which reads only the payload header, against a full
+# core.reveal_file on a stamped and an unstamped PNG of each size, then
+# indexes a directory of such files twice with lib_stegano.index to show
+# that a rescan of unchanged files only stats them.
+#
+#   python benchmarks/bench_probe.py --sizes 1024 2048 --files 50
+
+import argparse
+import os
+import tempfile
+import time
+
+import numpy as np
+from PIL import Image
+
+from common import timed
+from lib_stegano import core, index, scan
+
+MESSAGE = "Steps: 30, Sampler: DPM++ 2M Karras, CFG scale: 7, Seed: 3141592653, Size: 832x1216"
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark the header probe and the SQLite index.")
+    parser.add_argument("--sizes", type=int, nargs="+", default=[1024, 2048])
+    parser.add_argument("--files", type=int, default=50, help="files in the indexed directory")
+    parser.add_argument("--seed", type=int, default=42)
+    args = parser.parse_args()
+
+    rng = np.random.default_rng(0)
+    print(f"{'size':>6}  {'file':<10}{'probe ms':>10}{'reveal ms':>11}")
+    with tempfile.TemporaryDirectory() as workdir:
+        for size in args.sizes:
+            plain = os.path.join(workdir, f"plain{size}.png")
+            stamped = os.path.join(workdir, f"stamped{size}.png")
+            Image.fromarray(rng.integers(0, 256, (size, size, 3), dtype=np.uint8)).save(plain)
+            core.png_embed_file(plain, MESSAGE, args.seed, target=stamped)
+            for name, path in (("stamped", stamped), ("plain", plain)):
+                probe = timed(scan.probe_file, path, [args.seed])[1] * 1000
+                reveal = timed(core.reveal_file, path, args.seed)[1] * 1000
+                print(f"{size:>6}  {name:<10}{probe:>10.1f}{reveal:>11.1f}")
+
+        tree = os.path.join(workdir, "tree")
+        os.makedirs(tree)
+        for i in range(args.files):
+            path = os.path.join(tree, f"{i}.png")
+            Image.fromarray(rng.integers(0, 256, (512, 512, 3), dtype=np.uint8)).save(path)
+            if i % 2:
+                core.png_embed_file(path, MESSAGE, args.seed)
+        db = os.path.join(workdir, "index.sqlite")
+        for run in ("first scan", "rescan"):
+            start = time.perf_counter()
+            counts = index.update(db, [tree], [args.seed])
+            print(f"index {run}: {(time.perf_counter() - start) * 1000:.0f} ms, "
+                  f"{counts['probed']} probed, {counts['unchanged']} unchanged, {counts['payloads']} with a payload")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,46 @@
+# Fixtures shared by the benchmark scripts.
+#
+# Importing this module also puts the repository root on sys.path, so the
+# scripts can import lib_stegano wherever they are run from:
+#
+#   from common import GENINFO, synthetic_jpeg, timed
+
+import os
+import sys
+import time
+
+import numpy as np
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), ".."))
+
+# A geninfo sized message
+GENINFO = ("masterpiece, best quality, a lighthouse on a cliff at dawn\n"
+           "Negative prompt: (worst quality, low quality:1.4), blurry, watermark\n"
+           "Steps: 30, Sampler: DPM++ 2M Karras, CFG scale: 7, Seed: 3141592653, Size: 832x1216, "
+           "Model hash: 31e35c80fc, Model: sd_xl_base_1.0, Version: v1.10.1")
+
+
+def timed(func, *args):
+    """Return func(*args) and its wall time in seconds."""
+    start = time.perf_counter()
+    result = func(*args)
+    return result, time.perf_counter() - start
+
+
+def synthetic_jpeg(size, seed=None):
+    """DCT coefficient arrays of a size x size 4:2:0 JPEG, so jpeg_toolbox is not needed."""
+    rng = np.random.default_rng(size if seed is None else seed)
+    return [rng.laplace(0, 3, (size, size)).round().astype(np.int16),
+            rng.laplace(0, 1, (size // 2, size // 2)).round().astype(np.int16),
+            rng.laplace(0, 1, (size // 2, size // 2)).round().astype(np.int16)]
+
+
+def photo_image(size):
+    """Gradients plus noise, roughly as hard to compress as a generated image."""
+    from PIL import Image
+    rng = np.random.default_rng(size)
+    ramp = np.linspace(0, 255, size, dtype=np.float32)
+    img = np.stack([ramp[None, :].repeat(size, 0), ramp[:, None].repeat(size, 1),
+                    np.full((size, size), 128, np.float32)], axis=-1)
+    img += rng.normal(0, 12, img.shape).astype(np.float32)
+    return Image.fromarray(img.clip(0, 255).astype(np.uint8))
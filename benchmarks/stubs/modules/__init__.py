@@ -0,0 +1,2 @@
+# Minimal stand-ins for the Automatic1111 modules imported by the extension
+# scripts, so the benchmark suite can load them outside the WebUI.
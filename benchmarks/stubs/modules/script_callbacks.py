@@ -0,0 +1,34 @@
+callbacks_before_image_saved = []
+callbacks_image_saved = []
+callbacks_ui_tabs = []
+callbacks_script_unloaded = []
+
+
+class ImageSaveParams:
+    def __init__(self, image, p, filename, pnginfo):
+        self.image = image
+        self.p = p
+        self.filename = filename
+        self.pnginfo = pnginfo
+
+
+def on_before_image_saved(callback):
+    callbacks_before_image_saved.append(callback)
+
+
+def on_image_saved(callback):
+    callbacks_image_saved.append(callback)
+
+
+def on_ui_tabs(callback):
+    callbacks_ui_tabs.append(callback)
+
+
+def on_script_unloaded(callback):
+    callbacks_script_unloaded.append(callback)
+
+
+def remove_callbacks_for_function(callback):
+    for callbacks in (callbacks_before_image_saved, callbacks_image_saved, callbacks_ui_tabs, callbacks_script_unloaded):
+        while callback in callbacks:
+            callbacks.remove(callback)
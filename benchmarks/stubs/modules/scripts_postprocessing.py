@@ -0,0 +1,15 @@
+class PostprocessedImage:
+    def __init__(self, image):
+        self.image = image
+        self.info = {}
+
+
+class ScriptPostprocessing:
+    name = None
+    order = 1000
+
+    def ui(self):
+        return {}
+
+    def process(self, pp, **args):
+        pass
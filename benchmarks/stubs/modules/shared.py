@@ -0,0 +1,3 @@
+from types import SimpleNamespace
+
+cmd_opts = SimpleNamespace(lowvram=False, medvram=False)
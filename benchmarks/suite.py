@@ -0,0 +1,238 @@
+# Benchmark suite for the hide/reveal codecs and the save hook.
+#
+# Loads the extension scripts against the stand-in WebUI modules in
+# benchmarks/stubs and runs every case in a fresh interpreter, over a matrix
+# of resolutions, message sizes and seeds. Each case records the wall time of
+# the measured call and the peak RSS while it ran. Results can be saved as a
+# baseline and later runs compared against it; a case that is slower or uses
+# more memory than the baseline by more than --tolerance is a regression.
+#
+# hook_png runs after the WebUI has written the file, so the full cost of a
+# stamped PNG is save_png (the WebUI's own encode) plus hook_png. presave_png
+# is the before-save mode: stamping the in-memory image plus the single encode.
+#
+#   python benchmarks/suite.py --sizes 512 1024 --save-baseline benchmarks/baseline.json
+#   python benchmarks/suite.py --sizes 512 1024 --compare benchmarks/baseline.json
+#
+# JPEG cases need jpeg_toolbox and are skipped when it is not installed.
+
+import argparse
+import contextlib
+import importlib.util
+import io
+import json
+import os
+import resource
+import shutil
+import subprocess
+import sys
+import tempfile
+import time
+from types import SimpleNamespace
+
+HERE = os.path.dirname(os.path.abspath(__file__))
+ROOT = os.path.dirname(HERE)
+
+CASES = {
+    "embed_message": "png",
+    "extract_message": "png",
+    "hook_png": "png",
+    "save_png": "png",
+    "presave_png": "png",
+    "jpeg_lsbr_hide": "jpg",
+    "jpeg_lsbr_unhide": "jpg",
+    "hook_jpeg": "jpg",
+}
+
+GENINFO = ("masterpiece, best quality, a lighthouse on a cliff at dawn <lora:add_detail:0.6>\n"
+           "Negative prompt: (worst quality, low quality:1.4), blurry, watermark\n"
+           "Steps: 30, Sampler: DPM++ 2M Karras, CFG scale: 7, Seed: 3141592653, Size: 832x1216, "
+           "Model hash: 31e35c80fc, Model: sd_xl_base_1.0, Version: v1.10.1\n")
+
+
+def load_script(name):
+    """Import scripts/<name>.py the way the WebUI does, with the stub modules."""
+    for path in (os.path.join(HERE, "stubs"), ROOT):
+        if path not in sys.path:
+            sys.path.insert(0, path)
+    spec = importlib.util.spec_from_file_location(name, os.path.join(ROOT, "scripts", f"{name}.py"))
+    module = importlib.util.module_from_spec(spec)
+    spec.loader.exec_module(module)
+    return module
+
+
+def make_input(path, size):
+    """Write a synthetic photo-like test image: gradients plus noise."""
+    from common import photo_image
+    image = photo_image(size)
+    if path.endswith(".jpg"):
+        image.save(path, quality=95)
+    else:
+        image.save(path)
+
+
+def make_message(length, seed):
+    return (f"seed {seed} " + GENINFO * (length // len(GENINFO) + 1))[:length]
+
+
+def reset_peak_rss():
+    """Reset the kernel's peak RSS counter; returns False if unsupported."""
+    try:
+        with open("/proc/self/clear_refs", "w") as f:
+            f.write("5")
+        return True
+    except OSError:
+        return False
+
+
+def peak_rss_kb(reset):
+    if reset:
+        with open("/proc/self/status") as f:
+            for line in f:
+                if line.startswith("VmHWM:"):
+                    return int(line.split()[1])
+    return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+
+
+def run_case(spec, workdir):
+    """Run one case in this process and return its measurements."""
+    post = load_script("postprocessing_stegano")
+    case, seed = spec["case"], spec["seed"]
+    ext = CASES[case]
+    path = os.path.join(workdir, f"image.{ext}")
+    shutil.copy(spec["input"], path)
+    message = make_message(spec["message_bytes"], seed)
+    quiet = lambda *args: None
+
+    if case == "embed_message":
+        call = lambda: post.embed_message(path, message, seed, log=quiet)
+    elif case == "extract_message":
+        post.embed_message(path, message, seed, log=quiet)
+        call = lambda: post.extract_message(path, seed)
+    elif case in ("save_png", "presave_png"):
+        from PIL import Image
+        image = Image.open(path)
+        image.load()
+        callback = post.create_before_save_callback("", True, seed, True)
+
+        def call():
+            params = SimpleNamespace(image=image, filename=path, pnginfo={"parameters": message})
+            if case == "presave_png":
+                callback(params)
+            post.core.save_png(params.image, path, params.pnginfo)
+    elif case == "jpeg_lsbr_hide":
+        call = lambda: post.jpeg_lsbr_hide(path, seed, message)
+    elif case == "jpeg_lsbr_unhide":
+        post.core.save_jpeg(post.jpeg_lsbr_hide(path, seed, message), path)
+        call = lambda: post.jpeg_lsbr_unhide(path, seed)
+    else:
+        # The hook resolves params.filename against the working directory
+        os.chdir(workdir)
+        callback = post.create_postprocessing_callback("", True, seed, True)
+        params = SimpleNamespace(filename=os.path.basename(path), pnginfo={"parameters": message})
+        call = lambda: callback(params)
+
+    reset = reset_peak_rss()
+    start = time.perf_counter()
+    with contextlib.redirect_stdout(io.StringIO()):
+        call()
+    seconds = time.perf_counter() - start
+    return {"seconds": round(seconds, 5), "peak_rss_kb": peak_rss_kb(reset)}
+
+
+def case_key(spec):
+    return f"{spec['case']}/{spec['size']}/{spec['message_bytes']}/{spec['seed']}"
+
+
+def run_matrix(args, workdir):
+    have_jpeg = importlib.util.find_spec("jpeg_toolbox") is not None
+    results = {}
+    for size in args.sizes:
+        inputs = {}
+        for case in args.cases:
+            ext = CASES[case]
+            if ext == "jpg" and not have_jpeg:
+                continue
+            if ext not in inputs:
+                inputs[ext] = os.path.join(workdir, f"input_{size}.{ext}")
+                make_input(inputs[ext], size)
+            for message_bytes in args.messages:
+                for seed in args.seeds:
+                    spec = {"case": case, "size": size, "message_bytes": message_bytes,
+                            "seed": seed, "input": inputs[ext]}
+                    proc = subprocess.run([sys.executable, __file__, "--run-case", json.dumps(spec)],
+                                          capture_output=True, text=True)
+                    if proc.returncode != 0:
+                        error = proc.stderr.strip().splitlines()[-1] if proc.stderr.strip() else "failed"
+                        result = {"error": error}
+                    else:
+                        result = json.loads(proc.stdout.strip().splitlines()[-1])
+                    results[case_key(spec)] = result
+                    print(format_result(case_key(spec), result), flush=True)
+    if not have_jpeg:
+        print("jpeg_toolbox is not installed: JPEG cases skipped.")
+    return results
+
+
+def format_result(key, result, baseline=None):
+    if "error" in result:
+        return f"{key:<40} error: {result['error']}"
+    line = f"{key:<40}{result['seconds'] * 1000:>11.1f} ms{result['peak_rss_kb'] / 1024:>10.1f} MiB"
+    if baseline and "error" not in baseline:
+        line += (f"   baseline {baseline['seconds'] * 1000:>9.1f} ms"
+                 f"{baseline['peak_rss_kb'] / 1024:>9.1f} MiB")
+    return line
+
+
+def compare(results, baseline, tolerance):
+    """Print the cases that regressed; returns their number."""
+    regressions = 0
+    for key, result in results.items():
+        base = baseline.get(key)
+        if base is None or "error" in base or "error" in result:
+            continue
+        slower = result["seconds"] > base["seconds"] * (1 + tolerance)
+        larger = result["peak_rss_kb"] > base["peak_rss_kb"] * (1 + tolerance)
+        if slower or larger:
+            regressions += 1
+            what = " and ".join(w for w, flag in (("time", slower), ("memory", larger)) if flag)
+            print(f"REGRESSION ({what}) {format_result(key, result, base)}")
+    return regressions
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark suite for the stegano codecs and save hook.")
+    parser.add_argument("--sizes", type=int, nargs="+", default=[512, 1024, 2048, 4096, 8192])
+    parser.add_argument("--messages", type=int, nargs="+", default=[100, 1000, 10000],
+                        help="message sizes in bytes")
+    parser.add_argument("--seeds", type=int, nargs="+", default=[0, 1234])
+    parser.add_argument("--cases", nargs="+", choices=sorted(CASES), default=list(CASES))
+    parser.add_argument("--output", help="write the results to this JSON file")
+    parser.add_argument("--save-baseline", help="write the results as the baseline JSON file")
+    parser.add_argument("--compare", help="compare against this baseline JSON file")
+    parser.add_argument("--tolerance", type=float, default=0.25,
+                        help="allowed relative slowdown or memory growth (default 0.25)")
+    parser.add_argument("--run-case", help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.run_case:
+        with tempfile.TemporaryDirectory() as workdir:
+            print(json.dumps(run_case(json.loads(args.run_case), workdir)))
+        return 0
+
+    with tempfile.TemporaryDirectory() as workdir:
+        results = run_matrix(args, workdir)
+    for path in (args.output, args.save_baseline):
+        if path:
+            with open(path, "w") as f:
+                json.dump(results, f, indent=1, sort_keys=True)
+    if args.compare:
+        with open(args.compare) as f:
+            regressions = compare(results, json.load(f), args.tolerance)
+        print(f"{regressions} regression(s) against {args.compare}")
+        return 1 if regressions else 0
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
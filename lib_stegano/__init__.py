@@ -0,0 +1 @@
+# Shared steganography helpers for the Stegano extension scripts.
@@ -0,0 +1,169 @@
+# Binary bundles split over several images.
+#
+# A bundle (any file or stream of bytes, e.g. a workflow JSON, model hashes
+# and thumbnails zipped together) is cut into chunks that each fill one
+# image. Every chunk carries the bundle id, its index and a CRC-32, and the
+# last one also the SHA-256 of the whole bundle (payload.FLAG_CHUNK), so the
+# images can be revealed in any order and a missing or damaged chunk is
+# reported instead of returning a corrupt bundle.
+#
+# The source is read one chunk at a time as images become ready, so only the
+# chunks being embedded are held in memory. Images are decoded, embedded and
+# written on a thread pool. On reveal they are read on a thread pool and the
+# chunks are written out as soon as they are in order.
+
+import hashlib
+import io
+import os
+import threading
+from concurrent.futures import ThreadPoolExecutor, as_completed
+
+from lib_stegano import core, payload
+
+WORKERS = min(4, os.cpu_count() or 1)
+
+# Bytes read from a file source at a time
+READ_SIZE = 1 << 20
+
+# Bytes of an image's capacity taken by the headers and the bundle digest
+OVERHEAD = payload.HEADER.size + payload.CHUNK.size + payload.DIGEST_SIZE
+
+
+class ChunkReader:
+    """Cuts bytes, a file path, a binary file or an iterable of bytes into numbered chunks."""
+
+    def __init__(self, source):
+        self.file = None
+        if isinstance(source, (bytes, bytearray, memoryview)):
+            parts = [bytes(source)]
+        elif isinstance(source, (str, os.PathLike)):
+            self.file = open(source, "rb")
+            parts = iter(lambda: self.file.read(READ_SIZE), b"")
+        elif hasattr(source, "read"):
+            parts = iter(lambda: source.read(READ_SIZE), b"")
+        else:
+            parts = source
+        self.parts = iter(parts)
+        self.buffer = bytearray()
+        self.digest = hashlib.sha256()
+        self.index = 0
+        self.size = 0
+        self.done = False
+        self.lock = threading.Lock()
+
+    def next_chunk(self, size):
+        """Return (index, data, last, digest) for the next size bytes, or None at the end.
+
+        digest is the SHA-256 of the whole source for the last chunk, else b"".
+        """
+        with self.lock:
+            if self.done:
+                return None
+            # One byte more tells whether this chunk is the last one
+            while len(self.buffer) <= size:
+                part = next(self.parts, None)
+                if part is None:
+                    break
+                self.buffer += part
+            data = bytes(self.buffer[:size])
+            del self.buffer[:size]
+            self.done = not self.buffer
+            self.digest.update(data)
+            index = self.index
+            self.index += 1
+            self.size += len(data)
+            return index, data, self.done, self.digest.digest() if self.done else b""
+
+    def close(self):
+        if self.file is not None:
+            self.file.close()
+
+
+def hide_bundle(source, paths, targets, seed, bundle_id=None, workers=WORKERS):
+    """Embed source across the images at paths, writing the stamped images to targets.
+
+    Returns one record per image: {"path", "output", "chunk"}, with chunk
+    and output None for images that were not needed. Raises
+    payload.CapacityError if the images cannot hold the whole source; the
+    images written so far are kept.
+    """
+    bundle_id = bundle_id or os.urandom(8)
+    reader = ChunkReader(source)
+
+    def task(i):
+        if reader.done:
+            return None
+        img, bits = core.load_carrier(paths[i])
+        if bits // 8 <= OVERHEAD:
+            return None
+        chunk = reader.next_chunk(bits // 8 - OVERHEAD)
+        if chunk is None:
+            return None
+        index, data, last, digest = chunk
+        core.hide_payload_file(img, paths[i], targets[i], seed,
+                               payload.encode_chunk(bundle_id, index, data, last, digest))
+        return index
+
+    try:
+        with ThreadPoolExecutor(max_workers=max(1, workers)) as pool:
+            chunks = list(pool.map(task, range(len(paths))))
+    finally:
+        reader.close()
+    if not reader.done:
+        raise payload.CapacityError(f"the images hold the first {reader.size} bytes of the bundle, more images are needed")
+    return [{"path": path, "output": target if chunk is not None else None, "chunk": chunk}
+            for path, target, chunk in zip(paths, targets, chunks)]
+
+
+def reveal_bundle(paths, seed, out=None, workers=WORKERS):
+    """Reassemble the bundle hidden with seed in the images at paths.
+
+    The bundle is written to the binary file out, or returned as bytes if
+    out is None. Images without a chunk are skipped. Raises ValueError if a
+    chunk is missing or damaged, or the images hold chunks of several bundles.
+    """
+    target = io.BytesIO() if out is None else out
+
+    def task(path):
+        found = core.reveal_payload_file(path, seed)
+        if found is None or not found[0] & payload.FLAG_CHUNK:
+            return None
+        return payload.decode_chunk(found[1])
+
+    bundle_id = None
+    pending = {}
+    next_index = 0
+    last_index = None
+    expected = None
+    digest = hashlib.sha256()
+    with ThreadPoolExecutor(max_workers=max(1, workers)) as pool:
+        for future in as_completed([pool.submit(task, path) for path in paths]):
+            chunk = future.result()
+            if chunk is None:
+                continue
+            chunk_id, index, last, data, final = chunk
+            if bundle_id is None:
+                bundle_id = chunk_id
+            elif chunk_id != bundle_id:
+                raise ValueError("the images hold chunks of more than one bundle")
+            if index < next_index or index in pending:
+                # The same image given twice
+                continue
+            if last:
+                last_index, expected = index, final
+            pending[index] = data
+            while next_index in pending:
+                data = pending.pop(next_index)
+                digest.update(data)
+                target.write(data)
+                next_index += 1
+    if bundle_id is None:
+        raise ValueError("no bundle chunk found with this seed")
+    if last_index is None:
+        raise ValueError("the last chunk of the bundle is missing")
+    missing = [i for i in range(next_index, last_index + 1) if i not in pending]
+    if missing:
+        raise ValueError(f"{len(missing)} of {last_index + 1} chunks are missing: {', '.join(map(str, missing))}")
+    if digest.digest() != expected:
+        raise ValueError("the bundle does not match its digest")
+    return target.getvalue() if out is None else None
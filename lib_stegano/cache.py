@@ -0,0 +1,189 @@
+# Bounded on-disk cache for the files written by the Hide tab, and an
+# in-memory memo of Reveal results.
+#
+# Each output lives in its own directory named after a key built from the
+# input file content, the seed and the payload, so hiding the same message in
+# the same file twice returns the first result without decoding anything.
+# Entries older than max_age seconds are dropped, then the least recently
+# used ones until the cache fits in max_bytes. The directory mtime records
+# the last use, so the cache survives restarts.
+#
+# Reveal results are keyed by the file content, the seed and the payload
+# version of the reader, so a repeated reveal of the same file costs one hash
+# of the file instead of a full decode. A file stamped again has a new
+# content hash, so it is read afresh without any invalidation; its old
+# entries are left to the LRU bounds.
+
+import hashlib
+import os
+import shutil
+import tempfile
+import threading
+import time
+from collections import OrderedDict
+
+from lib_stegano import payload
+from lib_stegano.timing import stage
+
+HASH_CHUNK = 1 << 20
+
+# Bounds of the Reveal memo: entries, and total bytes of the messages held
+REVEAL_MEMO_ENTRIES = 4096
+REVEAL_MEMO_BYTES = int(os.environ.get("STEGANO_REVEAL_MEMO_MB", "64")) * 2 ** 20
+
+
+def file_digest(path):
+    """Return the sha256 hex digest of a file's content."""
+    digest = hashlib.sha256()
+    with open(path, "rb") as f:
+        for chunk in iter(lambda: f.read(HASH_CHUNK), b""):
+            digest.update(chunk)
+    return digest.hexdigest()
+
+
+def output_key(path, seed, message, compress=False):
+    """Key of the output of hiding message in path with seed."""
+    digest = hashlib.sha256()
+    # A new payload format must not be served from older entries
+    digest.update(f"{payload.VERSION}:{int(seed)}:{int(bool(compress))}:".encode())
+    digest.update(file_digest(path).encode())
+    digest.update(hashlib.sha256(message.encode("utf-8")).digest())
+    return digest.hexdigest()
+
+
+class OutputCache:
+    """Size and age bounded LRU cache of output files."""
+
+    def __init__(self, root, max_bytes, max_age):
+        self.root = root
+        self.max_bytes = max_bytes
+        self.max_age = max_age
+        self.lock = threading.Lock()
+        os.makedirs(root, exist_ok=True)
+        # Leftovers of a run that stopped while writing
+        for entry in os.scandir(root):
+            if entry.name.startswith(".tmp-"):
+                shutil.rmtree(entry.path, ignore_errors=True)
+        self.evict()
+
+    def lookup(self, key):
+        """Return the cached file for key, marking it as used, or None."""
+        entry = os.path.join(self.root, key)
+        with self.lock:
+            try:
+                names = os.listdir(entry)
+            except FileNotFoundError:
+                return None
+            if not names:
+                return None
+            os.utime(entry)
+            return os.path.join(entry, names[0])
+
+    def get_or_create(self, key, name, create):
+        """Return the cached file for key, calling create(path) to write it on a miss.
+
+        create writes the file named name at path; if it raises, nothing is
+        cached. Returns (path, hit).
+        """
+        cached = self.lookup(key)
+        if cached is not None:
+            return cached, True
+        # Written outside the lock, then moved into place in one rename
+        work = tempfile.mkdtemp(dir=self.root, prefix=".tmp-")
+        try:
+            create(os.path.join(work, os.path.basename(name)))
+            entry = os.path.join(self.root, key)
+            with self.lock:
+                if not os.path.exists(entry):
+                    os.replace(work, entry)
+                    work = None
+        finally:
+            if work is not None:
+                shutil.rmtree(work, ignore_errors=True)
+        self.evict()
+        return self.lookup(key), False
+
+    def entries(self):
+        """Return (last use, bytes, path) of every entry, oldest first."""
+        found = []
+        for entry in os.scandir(self.root):
+            if not entry.is_dir() or entry.name.startswith(".tmp-"):
+                continue
+            size = sum(f.stat().st_size for f in os.scandir(entry.path) if f.is_file())
+            found.append((entry.stat().st_mtime, size, entry.path))
+        return sorted(found)
+
+    def evict(self):
+        """Drop expired entries, then the least recently used ones above max_bytes."""
+        with self.lock:
+            entries = self.entries()
+            now = time.time()
+            total = sum(size for _, size, _ in entries)
+            for used, size, path in entries:
+                if now - used <= self.max_age and total <= self.max_bytes:
+                    continue
+                shutil.rmtree(path, ignore_errors=True)
+                total -= size
+
+    def stats(self):
+        with self.lock:
+            entries = self.entries()
+        return {"entries": len(entries), "bytes": sum(size for _, size, _ in entries)}
+
+
+def result_size(result):
+    message = result.get("message")
+    return len(message.encode("utf-8")) if message else 0
+
+
+class RevealMemo:
+    """LRU memo of reveal results keyed by (content hash, seed, payload version)."""
+
+    def __init__(self, max_entries=REVEAL_MEMO_ENTRIES, max_bytes=REVEAL_MEMO_BYTES):
+        self.max_entries = max_entries
+        self.max_bytes = max_bytes
+        self.lock = threading.Lock()
+        # key -> result
+        self.results = OrderedDict()
+        self.bytes = 0
+        self.hits = 0
+        self.misses = 0
+
+    def reveal(self, path, seed, reveal, timer=None):
+        """Return (result, hit) for path and seed, calling reveal() on a miss.
+
+        reveal returns a dict such as core.reveal_file's; failures are not
+        memoized.
+        """
+        with stage(timer, "hash"):
+            key = (file_digest(path), int(seed), payload.VERSION)
+        with self.lock:
+            result = self.results.get(key)
+            if result is not None:
+                self.results.move_to_end(key)
+                self.hits += 1
+                return dict(result), True
+            self.misses += 1
+        # Decoded outside the lock; two threads may decode the same file once each
+        result = dict(reveal())
+        with self.lock:
+            if key not in self.results:
+                self.results[key] = result
+                self.bytes += result_size(result)
+            self.evict()
+        return dict(result), False
+
+    def evict(self):
+        # Called with the lock held
+        while self.results and (len(self.results) > self.max_entries or self.bytes > self.max_bytes):
+            _, result = self.results.popitem(last=False)
+            self.bytes -= result_size(result)
+
+    def stats(self):
+        with self.lock:
+            return {"entries": len(self.results), "bytes": self.bytes,
+                    "hits": self.hits, "misses": self.misses}
+
+
+# Used by the Reveal tab
+reveal_memo = RevealMemo()
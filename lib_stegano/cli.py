@@ -0,0 +1,183 @@
+# Headless batch hide/reveal over files and directories.
+#
+# Runs without Automatic1111: only NumPy, Pillow and (for JPEG files)
+# jpeg_toolbox are needed. PNG and WebP files are written losslessly.
+# Files are spread over a multiprocessing pool and one JSON record per file is
+# streamed to the output as soon as it finishes. A failing file produces an
+# "error" record and does not stop the run.
+#
+#   python -m lib_stegano.cli hide  outputs/ --seed 42 --message "..." --output-dir stamped/ --jsonl hide.jsonl
+#   python -m lib_stegano.cli reveal stamped/ --seed 42 --jsonl reveal.jsonl --resume
+#
+# hide-bundle and reveal-bundle split a binary file over all the images
+# instead (see bundle.py), with a thread pool of --workers:
+#
+#   python -m lib_stegano.cli hide-bundle outputs/ --seed 42 --bundle provenance.zip --output-dir stamped/
+#   python -m lib_stegano.cli reveal-bundle stamped/ --seed 42 --bundle restored.zip
+#
+# index records which files carry a payload, and for which seed, in an
+# incremental SQLite index that only probes new and changed files (see
+# index.py):
+#
+#   python -m lib_stegano.cli index outputs/ --seeds 0-99 --db outputs.sqlite
+
+import argparse
+import json
+import multiprocessing
+import os
+import sys
+import time
+
+from lib_stegano import bundle, core, index, scan
+from lib_stegano.core import find_images
+
+
+def output_path(path, base, output_dir):
+    if output_dir is None:
+        return path
+    target = os.path.join(output_dir, os.path.relpath(path, base))
+    os.makedirs(os.path.dirname(target), exist_ok=True)
+    return target
+
+
+def run_task(task):
+    """Process one file in a pool worker and return its JSON record."""
+    command, path, target, seed, message, compress = task
+    start = time.perf_counter()
+    record = {"path": path, "command": command}
+    try:
+        if command == "hide":
+            record.update(core.hide_file(path, target, seed, message, compress))
+        else:
+            record.update(core.reveal_file(path, seed))
+        record["status"] = "ok"
+    except Exception as e:
+        record["status"] = "error"
+        record["error"] = f"{type(e).__name__}: {e}"
+    record["seconds"] = round(time.perf_counter() - start, 4)
+    return record
+
+
+def load_done(jsonl_path):
+    """Return the paths already processed successfully in a previous run."""
+    done = set()
+    if jsonl_path is None or not os.path.exists(jsonl_path):
+        return done
+    with open(jsonl_path, encoding="utf-8") as f:
+        for line in f:
+            try:
+                record = json.loads(line)
+            except ValueError:
+                # Last line of an interrupted run
+                continue
+            if record.get("status") == "ok":
+                done.add(record["path"])
+    return done
+
+
+def run_bundle(args):
+    """Run hide-bundle or reveal-bundle; "-" as --bundle means stdin or stdout."""
+    paths = [path for path, _ in find_images(args.paths)]
+    if args.command == "reveal-bundle":
+        out = sys.stdout.buffer if args.bundle == "-" else open(args.bundle, "wb")
+        try:
+            bundle.reveal_bundle(paths, args.seed, out, args.workers)
+        except Exception:
+            if out is not sys.stdout.buffer:
+                # Do not leave a partial bundle behind
+                out.close()
+                os.remove(args.bundle)
+            raise
+        if out is not sys.stdout.buffer:
+            out.close()
+        print(f"[stegano] Bundle restored from {len(paths)} files.", file=sys.stderr)
+        return 0
+    targets = [output_path(path, base, args.output_dir) for path, base in find_images(args.paths)]
+    source = sys.stdin.buffer if args.bundle == "-" else args.bundle
+    records = bundle.hide_bundle(source, paths, targets, args.seed, workers=args.workers)
+    out = open(args.jsonl, "a", encoding="utf-8") if args.jsonl else sys.stdout
+    try:
+        for record in records:
+            out.write(json.dumps(record, ensure_ascii=False) + "\n")
+    finally:
+        if out is not sys.stdout:
+            out.close()
+    used = sum(record["chunk"] is not None for record in records)
+    print(f"[stegano] Bundle split over {used} of {len(records)} files.", file=sys.stderr)
+    return 0
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(prog="python -m lib_stegano.cli",
+                                     description="Hide or reveal messages in JPEG and PNG files.")
+    parser.add_argument("command", choices=["hide", "reveal", "hide-bundle", "reveal-bundle", "index"])
+    parser.add_argument("paths", nargs="+", help="image files or directories")
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--seeds", help='seeds to probe, e.g. "0-99, 1234" (index, default --seed)')
+    parser.add_argument("--db", help="SQLite index to create or update (index)")
+    parser.add_argument("--message", help="message to hide")
+    parser.add_argument("--message-file", help="read the message to hide from this file")
+    parser.add_argument("--compress", action="store_true", help="zlib compress the payload (hide)")
+    parser.add_argument("--bundle", help="binary file to split over the images (hide-bundle) or to restore (reveal-bundle)")
+    parser.add_argument("--output-dir", help="write stamped files here (hide), keeping the directory layout")
+    parser.add_argument("--in-place", action="store_true", help="overwrite the input files (hide)")
+    parser.add_argument("--jsonl", help="append results to this file instead of stdout")
+    parser.add_argument("--resume", action="store_true", help="skip files already marked ok in --jsonl")
+    parser.add_argument("--workers", type=int, default=os.cpu_count())
+    args = parser.parse_args(argv)
+
+    message = args.message
+    if args.message_file:
+        with open(args.message_file, encoding="utf-8") as f:
+            message = f.read()
+    if args.command == "hide":
+        if message is None:
+            parser.error("hide needs --message or --message-file")
+        if args.output_dir is None and not args.in_place:
+            parser.error("hide needs --output-dir or --in-place")
+    if args.resume and args.jsonl is None:
+        parser.error("--resume needs --jsonl")
+    if args.command == "index":
+        if args.db is None:
+            parser.error("index needs --db")
+        seeds = scan.parse_seeds(args.seeds) if args.seeds else [args.seed]
+        counts = index.update(args.db, args.paths, seeds, args.workers)
+        print(f"[stegano] {counts['files']} files indexed: {counts['probed']} probed, {counts['unchanged']} unchanged, "
+              f"{counts['removed']} removed, {counts['payloads']} with a payload.", file=sys.stderr)
+        return 0
+    if args.command.endswith("-bundle"):
+        if args.bundle is None:
+            parser.error(f"{args.command} needs --bundle")
+        if args.command == "hide-bundle" and args.output_dir is None and not args.in_place:
+            parser.error("hide-bundle needs --output-dir or --in-place")
+        try:
+            return run_bundle(args)
+        except ValueError as e:
+            print(f"[stegano] {args.command} failed: {e}", file=sys.stderr)
+            return 1
+
+    done = load_done(args.jsonl) if args.resume else set()
+    tasks = []
+    for path, base in find_images(args.paths):
+        if path in done:
+            continue
+        target = output_path(path, base, args.output_dir) if args.command == "hide" else None
+        tasks.append((args.command, path, target, args.seed, message, args.compress))
+
+    out = open(args.jsonl, "a", encoding="utf-8") if args.jsonl else sys.stdout
+    failed = 0
+    try:
+        with multiprocessing.Pool(max(1, args.workers)) as pool:
+            for record in pool.imap_unordered(run_task, tasks, chunksize=4):
+                failed += record["status"] != "ok"
+                out.write(json.dumps(record, ensure_ascii=False) + "\n")
+                out.flush()
+    finally:
+        if out is not sys.stdout:
+            out.close()
+    print(f"[stegano] {len(tasks)} files processed, {failed} failed, {len(done)} skipped.", file=sys.stderr)
+    return 1 if failed else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,365 @@
+# File level hide/reveal shared by the WebUI scripts and the CLI.
+#
+# Importing this module only pulls in NumPy. jpeg_toolbox and Pillow are
+# imported on first use, so the WebUI starts without them and lightweight
+# workers only load what the files they touch need.
+
+import os
+
+from lib_stegano import jpeg, payload, pixels
+from lib_stegano.timing import stage
+
+JPEG_EXTENSIONS = ('.jpg', '.jpeg')
+PNG_EXTENSIONS = ('.png',)
+WEBP_EXTENSIONS = ('.webp',)
+
+# Lossless formats handled by the pixel engine. The png_* helpers work on all
+# of them; only the writer differs. AVIF is left out: Pillow only writes it
+# as YUV, which does not round trip the RGB values.
+PIXEL_EXTENSIONS = PNG_EXTENSIONS + WEBP_EXTENSIONS
+
+# Verification after embedding: "off", "sampled" (header and a sample of the
+# payload bits, PNG only) or "full"
+VERIFY_POLICIES = ("off", "sampled", "full")
+
+# Pillow's zlib level for PNG files (0-9); optimize=True is slower and smaller
+PNG_COMPRESS_LEVEL = 6
+
+# Low-memory mode for very large (e.g. 4x upscaled) images: the pixel engine
+# reads and writes only the selected pixels of the PIL image instead of
+# copying it to arrays, and the JPEG kernel recomputes its usable coefficient
+# masks block by block instead of keeping them. Low-memory mode is used when
+# low_memory is set (STEGANO_LOW_MEMORY=1, or the WebUI's --lowvram/--medvram),
+# or for images whose copies would exceed memory_limit bytes
+# (STEGANO_MEMORY_LIMIT_MB, default 256).
+low_memory = os.environ.get("STEGANO_LOW_MEMORY", "") not in ("", "0")
+memory_limit = int(os.environ.get("STEGANO_MEMORY_LIMIT_MB", "256")) * 2 ** 20
+
+# SparsePixels goes through Pillow one pixel at a time (about 5 us each), so
+# low-memory mode only uses it for payloads over at most this many pixels.
+# Larger payloads, such as bundle chunks that fill an image, use the arrays.
+SPARSE_MAX_PIXELS = 1 << 15
+
+# The legacy full-image shuffle needs ~64 bytes per pixel; it is not tried on
+# images that would need more than this (STEGANO_LEGACY_MEMORY_LIMIT_MB)
+legacy_memory_limit = int(os.environ.get("STEGANO_LEGACY_MEMORY_LIMIT_MB", "2048")) * 2 ** 20
+
+# Lossless WebP effort (0-100): 0 writes about 20x faster than Pillow's
+# default of 80 for files ~10% larger
+WEBP_EFFORT = 0
+
+
+def jpeg_toolbox():
+    """Import jpeg_toolbox on first use."""
+    import jpeg_toolbox as jt
+    return jt
+
+
+def load_jpeg(path, timer=None):
+    """Decode the DCT coefficients of a JPEG file."""
+    with stage(timer, "decode"):
+        return jpeg_toolbox().load(path)
+
+
+def save_jpeg(img, path, comment=None, timer=None):
+    """Write decoded coefficients back to a JPEG file."""
+    jt = jpeg_toolbox()
+    with stage(timer, "encode"):
+        jt.save(img, path)
+    if comment:
+        with stage(timer, "comment"):
+            jt.add_user_comment(path, comment)
+
+
+def jpeg_hide_file(path, seed, message, compress=False, timer=None):
+    """Decode a JPEG file and embed a message; returns the decoded image."""
+    img = load_jpeg(path, timer)
+    return jpeg.hide(img, seed, message, compress, timer, use_low_memory(img))
+
+
+def jpeg_unhide_file(path, seed, legacy=True, timer=None, details=None):
+    """Extract the message from a JPEG file."""
+    img = load_jpeg(path, timer)
+    return jpeg.unhide(img, seed, legacy, timer, details, use_low_memory(img))
+
+
+def find_images(paths):
+    """Yield the supported image files named by paths, walking directories."""
+    for path in paths:
+        if os.path.isdir(path):
+            for root, dirs, files in os.walk(path):
+                dirs.sort()
+                for name in sorted(files):
+                    if name.lower().endswith(JPEG_EXTENSIONS + PIXEL_EXTENSIONS):
+                        yield os.path.join(root, name), path
+        else:
+            yield path, os.path.dirname(path)
+
+
+def open_image(path):
+    from PIL import Image
+    return Image.open(path)
+
+
+def png_embed(path, message, seed, compress=False, timer=None):
+    """Embed a message in the pixels of a PNG file; returns the PIL image, nothing is written."""
+    return png_embed_image(open_image(path), message, seed, compress, timer)
+
+
+def use_low_memory(img):
+    """Return True if img (a PIL image or a decoded JPEG) should be processed in low-memory mode."""
+    if isinstance(img, dict):
+        # The kept masks take one byte per coefficient
+        return low_memory or sum(a.size for a in img["coef_arrays"]) > memory_limit
+    width, height = img.size
+    return low_memory or pixels.ARRAY_BYTES_PER_PIXEL * width * height > memory_limit
+
+
+def use_sparse_pixels(img, bits):
+    """Return True if a payload of bits in the PIL image img should be read and written through SparsePixels."""
+    return use_low_memory(img) and -(-bits // 3) <= SPARSE_MAX_PIXELS
+
+
+def legacy_fits(img):
+    """Return True if the legacy full-image order of img fits in legacy_memory_limit."""
+    width, height = img.size
+    return pixels.LEGACY_ORDER_BYTES_PER_PIXEL * width * height <= legacy_memory_limit
+
+
+def png_embed_image(img, message, seed, compress=False, timer=None):
+    """Embed a message in an in-memory PIL image that will be saved losslessly.
+
+    RGB images (and RGBA images in low-memory mode) are modified in place;
+    other modes are converted to RGB.
+    """
+    return pixels.embed(img, message, seed, compress=compress, timer=timer, low_memory=use_low_memory(img))
+
+
+def backup_pixels(img, message, seed, compress=False):
+    """Copy the pixels png_embed_image would change in img itself, for restore_pixels.
+
+    Returns None when png_embed_image works on a copy or would raise before
+    writing anything.
+    """
+    if not use_low_memory(img) or img.mode not in ('RGB', 'RGBA'):
+        return None
+    bits = 8 * len(payload.encode(message, compress))
+    if bits > pixels.capacity(img):
+        return None
+    width, height = img.size
+    idx = pixels.payload_pixels(width * height, seed, bits)
+    return idx, pixels.SparsePixels(img)[idx, :]
+
+
+def restore_pixels(img, backup):
+    """Write back the pixels saved by backup_pixels."""
+    idx, values = backup
+    pixels.SparsePixels(img)[idx, :] = values
+
+
+def save_png(img, path, text=None, compress_level=PNG_COMPRESS_LEVEL, optimize=False, timer=None):
+    """Write an image as PNG.
+
+    text holds the PNG text chunks to write, e.g. {"parameters": geninfo}.
+    """
+    from PIL import PngImagePlugin
+    meta = PngImagePlugin.PngInfo()
+    for key, value in (text or {}).items():
+        meta.add_text(key, value)
+    with stage(timer, "encode"):
+        img.save(path, format="PNG", pnginfo=meta, compress_level=compress_level, optimize=optimize)
+
+
+def png_embed_file(path, message, seed, target=None, text=None, compress=False, timer=None):
+    """Embed a message in a PNG file and write it to target (default: path).
+
+    text holds the PNG text chunks to write, e.g. {"parameters": geninfo}.
+    Returns the embedded PIL image.
+    """
+    img = png_embed(path, message, seed, compress, timer)
+    save_png(img, target or path, text, timer=timer)
+    return img
+
+
+def is_lossless_webp(path):
+    """Return True if path is a still WebP image stored losslessly (a VP8L chunk).
+
+    Lossy (VP8) and animated files return False.
+    """
+    with open(path, "rb") as f:
+        if f.read(12)[8:] != b"WEBP":
+            return False
+        while True:
+            chunk = f.read(8)
+            if len(chunk) < 8:
+                return False
+            fourcc, size = chunk[:4], int.from_bytes(chunk[4:], "little")
+            if fourcc == b"VP8L":
+                return True
+            if fourcc in (b"VP8 ", b"ANMF"):
+                return False
+            # Chunks are padded to an even size
+            f.seek(size + (size & 1), os.SEEK_CUR)
+
+
+def save_lossless(img, path, exif=None, timer=None, webp_effort=WEBP_EFFORT):
+    """Write an image as lossless WebP; path must have a WebP extension.
+
+    exif holds the raw EXIF block to keep (the WebUI stores geninfo there).
+    Raises ValueError if the format cannot be written losslessly.
+    """
+    options = {"exif": exif} if exif else {}
+    ext = os.path.splitext(path)[1].lower()
+    if ext in WEBP_EXTENSIONS:
+        # For lossless WebP, quality and method set the compression effort
+        options.update(format="WEBP", lossless=True, exact=True, quality=webp_effort, method=round(webp_effort * 6 / 100))
+    else:
+        raise ValueError(f"no lossless writer for {ext} files")
+    with stage(timer, "encode"):
+        img.save(path, **options)
+
+
+def save_pixels(img, target, source_info, text=None, compress_level=PNG_COMPRESS_LEVEL, optimize=False, timer=None):
+    """Write a stamped image as PNG or lossless WebP, chosen by the extension of target.
+
+    source_info is the info dict of the original image: its text chunks (PNG)
+    or EXIF block (WebP) are kept. text adds or replaces PNG text chunks.
+    """
+    if target.lower().endswith(PNG_EXTENSIONS):
+        chunks = {key: value for key, value in source_info.items() if isinstance(value, str)}
+        chunks.update(text or {})
+        save_png(img, target, chunks, compress_level, optimize, timer)
+    else:
+        save_lossless(img, target, source_info.get("exif"), timer)
+
+
+def png_extract_file(path, seed, legacy=True, timer=None, details=None):
+    """Extract the message from a PNG file."""
+    img = open_image(path)
+    legacy = legacy and legacy_fits(img)
+    return pixels.extract(img, seed, legacy, timer, use_low_memory(img), details)
+
+
+def hide_file(path, target, seed, message, compress=False, timer=None):
+    """Embed message in path, verify it and write the result to target.
+
+    Raises ValueError if verification fails or the file type is not supported.
+    """
+    if path.lower().endswith(JPEG_EXTENSIONS):
+        img = jpeg_hide_file(path, seed, message, compress, timer)
+        with stage(timer, "verify"):
+            verified = jpeg.unhide(img, seed, legacy=False, low_memory=use_low_memory(img)) == message
+        if not verified:
+            raise ValueError("verification failed")
+        save_jpeg(img, target, timer=timer)
+    elif path.lower().endswith(PIXEL_EXTENSIONS):
+        source = open_image(path)
+        img = png_embed_image(source, message, seed, compress, timer)
+        with stage(timer, "verify"):
+            verified = pixels.verify(img, message, seed, compress, low_memory=use_low_memory(img))
+        if not verified:
+            raise ValueError("verification failed")
+        save_pixels(img, target, source.info, timer=timer)
+    else:
+        raise ValueError("unsupported file type")
+    return {"output": target}
+
+
+def reveal_file(path, seed, timer=None):
+    """Return the message hidden in path and the order ("scheme") that held it."""
+    details = {}
+    if path.lower().endswith(JPEG_EXTENSIONS):
+        message = jpeg_unhide_file(path, seed, timer=timer, details=details)
+    elif path.lower().endswith(PIXEL_EXTENSIONS):
+        message = png_extract_file(path, seed, timer=timer, details=details)
+    else:
+        raise ValueError("unsupported file type")
+    return {"message": message, **details}
+
+
+def load_carrier(path, timer=None):
+    """Decode an image file for embedding raw payload bytes; returns (image, capacity in bits)."""
+    if path.lower().endswith(JPEG_EXTENSIONS):
+        img = load_jpeg(path, timer)
+        with stage(timer, "capacity"):
+            return img, jpeg.capacity(img)
+    if path.lower().endswith(PIXEL_EXTENSIONS):
+        img = open_image(path)
+        return img, pixels.capacity(img)
+    raise ValueError("unsupported file type")
+
+
+def hide_payload_file(img, path, target, seed, data, timer=None):
+    """Embed encoded payload bytes in an image from load_carrier, verify them and write target.
+
+    Raises ValueError if verification fails.
+    """
+    if path.lower().endswith(JPEG_EXTENSIONS):
+        low = use_low_memory(img)
+        jpeg.hide_payload(img, seed, data, timer, low)
+        with stage(timer, "verify"):
+            found = jpeg.unhide_payload(img, seed, low)
+        if found is None or found[1] != data[payload.HEADER.size:]:
+            raise ValueError("verification failed")
+        save_jpeg(img, target, timer=timer)
+        return
+    source_info = img.info
+    low = use_sparse_pixels(img, 8 * len(data))
+    img = pixels.embed_payload(img, data, seed, timer, low)
+    with stage(timer, "verify"):
+        verified = pixels.verify_payload(img, data, seed, low_memory=low)
+    if not verified:
+        raise ValueError("verification failed")
+    save_pixels(img, target, source_info, timer=timer)
+
+
+def reveal_payload_file(path, seed, timer=None):
+    """Return (flags, payload bytes) of the headed payload in path, or None."""
+    if path.lower().endswith(JPEG_EXTENSIONS):
+        img = load_jpeg(path, timer)
+        with stage(timer, "read"):
+            return jpeg.unhide_payload(img, seed, use_low_memory(img))
+    if path.lower().endswith(PIXEL_EXTENSIONS):
+        img = open_image(path)
+        with stage(timer, "read"):
+            if not use_low_memory(img) or img.mode not in ('RGB', 'RGBA'):
+                return pixels.extract_payload(img, seed)
+            # Read the header sparsely; its length decides how to read the rest
+            header = pixels.read_header(pixels.SparsePixels(img), seed)
+            if header is None:
+                return None
+            return pixels.extract_payload(img, seed, use_sparse_pixels(img, payload.HEADER_BITS + 8 * header[2]))
+    raise ValueError("unsupported file type")
+
+
+def compression_report(message):
+    """Return a log line with the compressed and plain payload sizes."""
+    plain = len(message.encode('utf-8'))
+    packed = len(payload.encode(message, compress_payload=True)) - payload.HEADER.size
+    return f"[stegano] Payload compressed {plain} -> {packed} bytes ({plain / max(packed, 1):.1f}x, {8 * (plain - packed)} fewer bits)."
+
+
+def verify_png(img, message, seed, policy="full", compress=False, log=print):
+    """Verify an embedded PNG image in memory according to policy.
+
+    Returns True if the payload matches or policy is "off".
+    """
+    if policy == "off":
+        return True
+    sample = pixels.VERIFY_SAMPLE_BITS if policy == "sampled" else None
+    if pixels.verify(img, message, seed, compress, sample, use_low_memory(img)):
+        log(f"[stegano] Verification successful ({policy}). Embedded and expected payloads match.")
+        return True
+    log(f"[stegano] Verification failed ({policy}). Embedded and expected payloads do not match.")
+    return False
+
+
+def check_verification(original, extracted, log=print):
+    """Log whether the extracted message matches; returns True if it does."""
+    if extracted == original:
+        log("[stegano] Verification successful. Embedded and extracted messages match.")
+        return True
+    log("[stegano] Verification failed. Embedded and extracted messages do not match.")
+    log(f"[stegano] Original message: {original}")
+    log(f"[stegano] Extracted message: {extracted}")
+    return False
@@ -0,0 +1,142 @@
+# Incremental SQLite index of the payloads in an image tree.
+#
+# One row per image file: path, mtime, size, content hash, format and the
+# probe result (seed, version, flags, payload length, NULL without a
+# payload). A rescan stats every file and only probes the ones whose mtime or
+# size changed, that were indexed for another list of seeds, or whose last
+# probe failed. A changed file with the same content hash keeps its row
+# without being decoded, and rows of files that disappeared are removed.
+# Probing runs on a multiprocessing pool; the database is only touched by the
+# calling process.
+#
+#   python -m lib_stegano.cli index outputs/ --seeds 0-99 --db outputs.sqlite
+#   sqlite3 outputs.sqlite "select path, seed, length from files where seed is not null"
+
+import hashlib
+import multiprocessing
+import os
+import sqlite3
+import time
+
+from lib_stegano import cache, scan
+from lib_stegano.core import find_images
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS files (
+    path TEXT PRIMARY KEY,
+    mtime REAL NOT NULL,
+    size INTEGER NOT NULL,
+    digest TEXT NOT NULL,
+    format TEXT NOT NULL,
+    seeds TEXT NOT NULL,
+    seed INTEGER,
+    version INTEGER,
+    flags INTEGER,
+    length INTEGER,
+    error TEXT,
+    seen INTEGER NOT NULL
+);
+"""
+
+# Rows written per transaction
+BATCH_ROWS = 1000
+
+
+def seeds_key(seeds):
+    """Short key of a seed list, stored with each row."""
+    return hashlib.sha256(",".join(map(str, seeds)).encode()).hexdigest()[:16]
+
+
+def connect(db_path):
+    conn = sqlite3.connect(db_path)
+    conn.executescript(SCHEMA)
+    return conn
+
+
+def probe_task(task):
+    """Hash and probe one file in a pool worker; returns its row values."""
+    path, mtime, size, seeds, old_digest = task
+    record = {"path": path, "mtime": mtime, "size": size,
+              "format": os.path.splitext(path)[1].lower().lstrip("."),
+              "seed": None, "version": None, "flags": None, "length": None, "error": None}
+    try:
+        record["digest"] = cache.file_digest(path)
+        if record["digest"] == old_digest:
+            # Touched but not changed: keep the probe result
+            return record, False
+        found = scan.probe_file(path, seeds)
+        if found is not None:
+            record.update(found)
+    except Exception as e:
+        record.setdefault("digest", "")
+        record["error"] = f"{type(e).__name__}: {e}"
+    return record, True
+
+
+def update(db_path, roots, seeds, workers=None):
+    """Index the images under roots, probing only new and changed files.
+
+    Returns counts: {"files", "probed", "unchanged", "removed", "payloads"}.
+    """
+    key = seeds_key(seeds)
+    run = time.time_ns()
+    conn = connect(db_path)
+    counts = {"files": 0, "probed": 0, "unchanged": 0, "removed": 0}
+    tasks, seen = [], []
+
+    def mark_seen():
+        with conn:
+            conn.executemany("UPDATE files SET seen = ? WHERE path = ?", [(run, path) for path in seen])
+        counts["unchanged"] += len(seen)
+        seen.clear()
+
+    for path, _ in find_images(roots):
+        path = os.path.abspath(path)
+        try:
+            st = os.stat(path)
+        except OSError:
+            continue
+        counts["files"] += 1
+        row = conn.execute("SELECT mtime, size, digest, seeds, error FROM files WHERE path = ?", (path,)).fetchone()
+        if (row is not None and row[0] == st.st_mtime and row[1] == st.st_size and row[3] == key
+                and row[4] is None):
+            seen.append(path)
+            if len(seen) >= BATCH_ROWS:
+                mark_seen()
+            continue
+        old_digest = row[2] if row is not None and row[3] == key and row[4] is None else None
+        tasks.append((path, st.st_mtime, st.st_size, seeds, old_digest))
+    mark_seen()
+
+    def store(records):
+        with conn:
+            conn.executemany(
+                "INSERT OR REPLACE INTO files (path, mtime, size, digest, format, seeds, seed, version, flags, length, error, seen) "
+                "VALUES (:path, :mtime, :size, :digest, :format, :seeds, :seed, :version, :flags, :length, :error, :seen)",
+                [r for r, probed in records if probed])
+            conn.executemany("UPDATE files SET mtime = ?, size = ?, seen = ? WHERE path = ?",
+                             [(r["mtime"], r["size"], run, r["path"]) for r, probed in records if not probed])
+
+    if tasks:
+        records = []
+        with multiprocessing.Pool(max(1, min(workers or os.cpu_count() or 1, len(tasks)))) as pool:
+            for record, probed in pool.imap_unordered(probe_task, tasks, chunksize=16):
+                record.update(seeds=key, seen=run)
+                counts["probed" if probed else "unchanged"] += 1
+                records.append((record, probed))
+                if len(records) >= BATCH_ROWS:
+                    store(records)
+                    records = []
+        store(records)
+
+    # Files under the scanned roots that are gone
+    with conn:
+        for root in roots:
+            root = os.path.abspath(root)
+            prefix = os.path.join(root, "")
+            removed = conn.execute("DELETE FROM files WHERE seen != ? AND (path = ? OR substr(path, 1, ?) = ?)",
+                                   (run, root, len(prefix), prefix))
+            counts["removed"] += removed.rowcount
+    counts["payloads"] = conn.execute("SELECT count(*) FROM files WHERE seed IS NOT NULL").fetchone()[0]
+    conn.close()
+    return counts
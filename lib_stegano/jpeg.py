@@ -0,0 +1,219 @@
+# LSB replacement on the DCT coefficients of a decoded JPEG.
+#
+# Works on the dictionary returned by jpeg_toolbox.load, so the caller decides
+# when the file is decoded and written. The message is prefixed with the
+# payload header and spread over the usable coefficients of every component
+# (luma and chroma), visited in the order of a keyed permutation of which only
+# the positions actually used are computed.
+#
+# Readers fall back to the legacy NUL terminated format, written along a
+# random.shuffle of the usable luma coefficients.
+#
+# The keyed order is handled in place on the coefficient arrays: UsableMap
+# counts the usable coefficients of each block of rows, and maps the ranks
+# the payload uses to (array, flat position) pairs, so neither the
+# concatenation of the arrays nor the index of every usable coefficient is
+# built. With low_memory, the per-block masks are recomputed when locating
+# instead of kept, so the extra memory stays at one block.
+
+import random
+import numpy as np
+
+from lib_stegano import payload
+from lib_stegano.permutation import KeyedPermutation
+from lib_stegano.timing import set_payload_bits, stage
+
+
+def usable_indices(dct):
+    """Return the flat indices of the DCT coefficients we can change."""
+    dct_copy = dct.copy()
+    # Do not use 0 and 1 coefficients
+    dct_copy[np.abs(dct_copy) == 1] = 0
+    # Do not use the DC DCT coefficients
+    dct_copy[::8, ::8] = 0
+    return np.where(dct_copy.flatten() != 0)[0]
+
+
+# Coefficients in one block of rows of the keyed kernel
+CHUNK_COEFFS = 1 << 20
+
+
+def block_rows(dct):
+    """Rows of dct per block: about CHUNK_COEFFS coefficients, a multiple of 8."""
+    return max(8, CHUNK_COEFFS // max(1, dct.shape[1]) // 8 * 8)
+
+
+def row_blocks(dct):
+    """Yield (first row, rows) of dct, block by block."""
+    rows = block_rows(dct)
+    for start in range(0, dct.shape[0], rows):
+        yield start, dct[start:start + rows]
+
+
+def usable_mask(rows, out=None):
+    """Mask of the usable coefficients of rows starting on a block boundary."""
+    mask = np.abs(rows, out=out) > 1
+    mask[::8, ::8] = False
+    return mask
+
+
+class UsableMap:
+    """Rank -> position map of the usable coefficients of every array, in concatenation order."""
+
+    def __init__(self, arrays, low_memory=False):
+        self.arrays = arrays
+        self.low_memory = low_memory
+        # (array index, first row, mask or None) and usable count of each block
+        self.blocks = []
+        self.counts = []
+        for i, dct in enumerate(arrays):
+            buffer = None
+            for start, rows in row_blocks(dct):
+                if buffer is None:
+                    buffer = np.empty(rows.shape, dct.dtype)
+                mask = usable_mask(rows, buffer[:len(rows)])
+                self.counts.append(np.count_nonzero(mask))
+                self.blocks.append((i, start, None if low_memory else mask))
+        self.ends = np.cumsum(self.counts, dtype=np.int64)
+
+    def __len__(self):
+        return int(self.ends[-1]) if len(self.ends) else 0
+
+    def locate(self, ranks):
+        """Return (array index, flat position) arrays of the usable coefficients at ranks."""
+        ranks = np.asarray(ranks, dtype=np.int64)
+        which = np.empty(len(ranks), dtype=np.int64)
+        positions = np.empty(len(ranks), dtype=np.int64)
+        block_of = np.searchsorted(self.ends, ranks, side="right")
+        for block in np.unique(block_of):
+            i, start, mask = self.blocks[block]
+            dct = self.arrays[i]
+            if mask is None:
+                mask = usable_mask(dct[start:start + block_rows(dct)])
+            sel = block_of == block
+            first = self.ends[block] - self.counts[block]
+            which[sel] = i
+            positions[sel] = start * dct.shape[1] + np.flatnonzero(mask)[ranks[sel] - first]
+        return which, positions
+
+
+def read_lsbs(arrays, which, positions):
+    """LSBs of the coefficients at (array, flat position), as uint8."""
+    bits = np.empty(len(positions), dtype=np.uint8)
+    for i, dct in enumerate(arrays):
+        sel = which == i
+        # The LSB of a two's complement integer is the LSB of its magnitude
+        bits[sel] = np.take(dct, positions[sel]).astype(np.int64) & 1
+    return bits
+
+
+def write_lsbs(arrays, which, positions, bits):
+    """Set the magnitude LSB of the coefficients at (array, flat position) to bits, in place."""
+    for i, dct in enumerate(arrays):
+        sel = which == i
+        values = np.take(dct, positions[sel]).astype(np.int64)
+        magnitude = (np.abs(values) & ~1) | bits[sel]
+        np.put(dct, positions[sel], np.where(values < 0, -magnitude, magnitude))
+
+
+def capacity(img):
+    """Return the number of bits the decoded JPEG can hold."""
+    total = 0
+    for dct in img["coef_arrays"]:
+        # Usable coefficients are |c| > 1 outside the DC positions
+        total += np.count_nonzero(np.abs(dct) > 1) - np.count_nonzero(np.abs(dct[::8, ::8]) > 1)
+    return int(total)
+
+
+def component_indices(arrays):
+    """Usable indices of every array, as indices into their concatenation."""
+    parts = []
+    offset = 0
+    for dct in arrays:
+        parts.append(usable_indices(dct) + offset)
+        offset += dct.size
+    return np.concatenate(parts)
+
+
+def shuffled_indices(idx, seed):
+    """Select the legacy pseudorandom order of the usable DCT coefficients."""
+    # Same order as random.seed + random.shuffle, without the global state
+    random.Random(int(seed)).shuffle(idx)
+    return idx
+
+
+def read_bits(dct, idx):
+    """Return the LSBs of the flattened coefficients dct[idx]."""
+    return (dct[idx] % 2).astype('uint8')
+
+
+def hide(img, seed, message, compress=False, timer=None, low_memory=False):
+    """Embed a message in the coefficients of a decoded JPEG, in place.
+
+    compress=True zlib compresses the payload when that makes it shorter.
+    Raises payload.CapacityError before touching the coefficients if the
+    message does not fit. timer is an optional timing.StageTimer.
+    low_memory=True keeps the extra memory to one block of rows.
+    """
+    return hide_payload(img, seed, payload.encode(message, compress), timer, low_memory)
+
+
+def hide_payload(img, seed, data, timer=None, low_memory=False):
+    """Embed encoded payload bytes (header included) in keyed order, in place; see hide."""
+    bits = payload.to_bits(data)
+    set_payload_bits(timer, len(bits))
+    arrays = img["coef_arrays"]
+    with stage(timer, "capacity"):
+        usable = UsableMap(arrays, low_memory)
+    if len(bits) > len(usable):
+        raise payload.CapacityError(f"message needs {len(bits)} bits, the image holds {len(usable)}")
+    with stage(timer, "select"):
+        which, positions = usable.locate(KeyedPermutation(len(usable), seed)[:len(bits)])
+    with stage(timer, "embed"):
+        write_lsbs(arrays, which, positions, bits)
+    return img
+
+
+def unhide_payload(img, seed, low_memory=False):
+    """Return (flags, payload bytes) of a keyed payload, or None."""
+    arrays = img["coef_arrays"]
+    usable = UsableMap(arrays, low_memory)
+    order = KeyedPermutation(len(usable), seed)
+    header = payload.parse_header(payload.from_bits(read_lsbs(arrays, *usable.locate(order[:payload.HEADER_BITS]))))
+    if header is None:
+        return None
+    _, flags, length = header
+    if payload.HEADER_BITS + 8 * length > len(usable):
+        return None
+    bits = read_lsbs(arrays, *usable.locate(order[payload.HEADER_BITS:payload.HEADER_BITS + 8 * length]))
+    return flags, payload.from_bits(bits)
+
+
+def unhide(img, seed, legacy=True, timer=None, details=None, low_memory=False):
+    """Extract the message from a decoded JPEG.
+
+    With legacy=False, images without a payload header return None after
+    reading the header bits instead of decoding every usable coefficient.
+    If details is a dict, the coefficient order that held the message is
+    stored in details["scheme"] ("keyed" or "legacy").
+    low_memory only applies to the keyed order; the legacy one needs an
+    index of every usable luma coefficient.
+    """
+    if details is None:
+        details = {}
+    with stage(timer, "read"):
+        found = unhide_payload(img, seed, low_memory)
+    if found is not None:
+        details["scheme"] = "keyed"
+        return payload.decode(found[1], found[0])
+    if not legacy:
+        return None
+    dct = img["coef_arrays"][0]
+    with stage(timer, "select"):
+        idx = usable_indices(dct)
+    with stage(timer, "shuffle"):
+        idx = shuffled_indices(idx, seed)
+    with stage(timer, "read"):
+        data = payload.from_bits(read_bits(dct.ravel(), idx))
+    details["scheme"] = "legacy"
+    return payload.decode_legacy(data)
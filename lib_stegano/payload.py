@@ -0,0 +1,183 @@
+# Versioned header written in front of the embedded payload.
+#
+# The header holds a magic, the format version, flag bits and the payload
+# length in bytes, so a reader only decodes the bits it needs and can reject
+# an image after HEADER_BITS bits. Images without the magic are read with the
+# legacy NUL terminated format.
+#
+# The payload is UTF-8 text, optionally zlib compressed with a preset
+# dictionary of Automatic1111 infotext. The flags record how to decode it.
+#
+# With FLAG_CHUNK the payload is instead one chunk of a binary bundle spread
+# over several images (see bundle.py): a chunk header with the bundle id,
+# the chunk index, chunk flags and the CRC-32 of the data, then the data.
+# The last chunk ends with the SHA-256 of the whole bundle.
+
+import struct
+import zlib
+import numpy as np
+
+MAGIC = b"StG"
+
+# Version of the header. Only this version is read: the earlier ones were
+# never released.
+VERSION = 3
+
+HEADER = struct.Struct(">3sBBI")
+HEADER_BITS = HEADER.size * 8
+
+
+# Header flags
+FLAG_ZLIB = 0x01
+FLAG_GENINFO_DICT = 0x02
+FLAG_CHUNK = 0x04
+
+CHUNK = struct.Struct(">8sIBI")
+
+# Chunk flags
+CHUNK_LAST = 0x01
+
+# Size of the bundle digest at the end of the last chunk
+DIGEST_SIZE = 32
+
+# Preset dictionary for zlib, built from the keys and common values of A1111
+# generation parameters. zlib matches the end of the dictionary most cheaply,
+# so the most frequent strings come last. Changing it breaks images written
+# with FLAG_GENINFO_DICT; add a new flag for a new dictionary instead.
+GENINFO_DICT = (
+    b"<lora:<lyco:embedding:BREAK, (masterpiece:1.2), (best quality:1.2), "
+    b"photorealistic, ultra detailed, highly detailed, 8k, 4k, detailed face, "
+    b"beautiful, portrait, 1girl, solo, looking at viewer, smile, long hair, "
+    b"Negative prompt: (worst quality, low quality:1.4), lowres, bad anatomy, "
+    b"bad hands, text, error, missing fingers, extra digit, fewer digits, "
+    b"cropped, jpeg artifacts, signature, watermark, username, blurry, "
+    b"deformed, disfigured, ugly, nsfw, easynegative, "
+    b", ADetailer model: face_yolov8n.pt, ADetailer confidence: 0.3, "
+    b"ADetailer dilate erode: 4, ADetailer mask blur: 4, "
+    b"ADetailer denoising strength: 0.4, ADetailer inpaint only masked: True, "
+    b"ADetailer inpaint padding: 32, ADetailer version: "
+    b", Hires upscale: 2, Hires steps: , Hires upscaler: Latent, "
+    b"R-ESRGAN 4x+, 4x-UltraSharp, ESRGAN_4x, SwinIR_4x, "
+    b", Denoising strength: 0.7, Clip skip: 2, ENSD: 31337, "
+    b", Lora hashes: \", TI hashes: \", Emphasis: Original, "
+    b", Schedule type: Automatic, Karras, Exponential, "
+    b"Sampler: Euler a, Euler, DPM++ 2M Karras, DPM++ 2M SDE Karras, "
+    b"DPM++ SDE Karras, DPM++ 2M, DPM++ SDE, DDIM, UniPC, LMS, Heun, DPM2, "
+    b", Size: 512x512, 512x768, 768x512, 768x768, 832x1216, 1024x1024, "
+    b", Model hash: , Model: sd_xl_base_1.0, v1-5-pruned-emaonly, "
+    b", VAE hash: , VAE: , Version: v1.10.1, f2.0.1v1.10.1-previous-"
+    b"Steps: 20, Steps: 30, Sampler: , CFG scale: 7, Seed: "
+)
+
+
+class CapacityError(ValueError):
+    """The payload does not fit in the image."""
+
+
+def compress(data):
+    """zlib compress data with the geninfo dictionary."""
+    compressor = zlib.compressobj(9, zlib.DEFLATED, -15, 9, zlib.Z_DEFAULT_STRATEGY, GENINFO_DICT)
+    return compressor.compress(data) + compressor.flush()
+
+
+def decompress(data, flags):
+    if flags & FLAG_GENINFO_DICT:
+        decompressor = zlib.decompressobj(-15, GENINFO_DICT)
+    else:
+        decompressor = zlib.decompressobj(-15)
+    try:
+        return decompressor.decompress(data) + decompressor.flush()
+    except zlib.error as e:
+        raise ValueError(f"corrupt compressed payload: {e}")
+
+
+def encode(message, compress_payload=False):
+    """Return header + payload bytes for a text message.
+
+    With compress_payload, the text is zlib compressed with the geninfo
+    dictionary when that makes it shorter.
+    """
+    data = message.encode('utf-8')
+    flags = 0
+    if compress_payload:
+        packed = compress(data)
+        if len(packed) < len(data):
+            data = packed
+            flags = FLAG_ZLIB | FLAG_GENINFO_DICT
+    return HEADER.pack(MAGIC, VERSION, flags, len(data)) + data
+
+
+def decode(data, flags=0):
+    """Return the text message held in payload bytes."""
+    if flags & FLAG_CHUNK:
+        _, index, _, _ = CHUNK.unpack_from(data)
+        raise ValueError(f"the image holds chunk {index} of a binary bundle, not a message")
+    if flags & FLAG_ZLIB:
+        data = decompress(data, flags)
+    return data.decode('utf-8', errors='replace')
+
+
+def encode_chunk(bundle_id, index, data, last=False, digest=b""):
+    """Return header + payload bytes for chunk index of a bundle.
+
+    The last chunk carries the digest of the whole bundle after its data.
+    """
+    body = CHUNK.pack(bundle_id, index, CHUNK_LAST if last else 0, zlib.crc32(data)) + data + digest
+    return HEADER.pack(MAGIC, VERSION, FLAG_CHUNK, len(body)) + body
+
+
+def decode_chunk(data):
+    """Return (bundle id, index, last, data, digest) of chunk payload bytes.
+
+    Raises ValueError if the data does not match its checksum.
+    """
+    if len(data) < CHUNK.size:
+        raise ValueError("truncated chunk")
+    bundle_id, index, chunk_flags, crc = CHUNK.unpack_from(data)
+    last = bool(chunk_flags & CHUNK_LAST)
+    body = data[CHUNK.size:]
+    digest = b""
+    if last:
+        body, digest = body[:-DIGEST_SIZE], body[-DIGEST_SIZE:]
+    if zlib.crc32(body) != crc:
+        raise ValueError(f"chunk {index} does not match its checksum")
+    return bundle_id, index, last, body, digest
+
+
+def parse_header(header):
+    """Return (version, flags, length), or None if there is no known header."""
+    if len(header) < HEADER.size:
+        return None
+    magic, version, flags, length = HEADER.unpack(header[:HEADER.size])
+    if magic != MAGIC or version != VERSION:
+        return None
+    return version, flags, length
+
+
+def to_bits(data):
+    """Convert bytes to an array of bits, one uint8 per bit."""
+    return np.unpackbits(np.frombuffer(data, dtype=np.uint8))
+
+
+def from_bits(bits):
+    """Convert an array of bits back to bytes, dropping a trailing partial byte."""
+    bits = np.asarray(bits, dtype=np.uint8)
+    return np.packbits(bits[:len(bits) - len(bits) % 8]).tobytes()
+
+
+def text_to_bits(text):
+    """Convert text to an array of bits of its UTF-8 encoding."""
+    return to_bits(text.encode('utf-8'))
+
+
+def decode_legacy(data):
+    """Return the text before the first NUL of a legacy payload.
+
+    Old versions wrote one byte per character (Latin-1); newer legacy mode
+    writes UTF-8. UTF-8 is tried first, as Latin-1 text is rarely valid UTF-8.
+    """
+    data = data.split(b'\0', 1)[0]
+    try:
+        return data.decode('utf-8')
+    except UnicodeDecodeError:
+        return data.decode('latin-1')
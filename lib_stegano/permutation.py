@@ -0,0 +1,58 @@
+# Keyed, lazily evaluated permutation of range(size).
+#
+# A balanced Feistel network over the smallest even-bit domain that holds
+# size, with cycle-walking to bring values back inside range(size). Position
+# i of the permutation is computed on demand, so selecting the first n
+# positions costs O(n) regardless of the image size.
+
+import hashlib
+import numpy as np
+
+ROUNDS = 4
+
+_MUL1 = np.uint64(0xbf58476d1ce4e5b9)
+_MUL2 = np.uint64(0x94d049bb133111eb)
+
+
+class KeyedPermutation:
+    """Bijection of range(size) keyed by seed. Supports len() and slicing."""
+
+    def __init__(self, size, seed):
+        self.size = size
+        self.half_bits = np.uint64(max(1, ((size - 1).bit_length() + 1) // 2))
+        self.mask = np.uint64((1 << int(self.half_bits)) - 1)
+        digest = hashlib.sha256(f"stegano:{int(seed)}".encode()).digest()
+        self.keys = [np.uint64(int.from_bytes(digest[i * 8:(i + 1) * 8], "little")) for i in range(ROUNDS)]
+
+    def __len__(self):
+        return self.size
+
+    def __getitem__(self, item):
+        if isinstance(item, slice):
+            return self.take(np.arange(*item.indices(self.size), dtype=np.uint64))
+        return int(self.take(np.array([item], dtype=np.uint64))[0])
+
+    def _round(self, right, key):
+        # splitmix64 finalizer
+        z = (right ^ key) * _MUL1
+        z ^= z >> np.uint64(31)
+        z *= _MUL2
+        z ^= z >> np.uint64(29)
+        return z & self.mask
+
+    def _feistel(self, values):
+        left = values >> self.half_bits
+        right = values & self.mask
+        for key in self.keys:
+            left, right = right, left ^ self._round(right, key)
+        return (left << self.half_bits) | right
+
+    def take(self, index):
+        """Return the permuted positions for an array of indices."""
+        values = self._feistel(np.asarray(index, dtype=np.uint64))
+        # Cycle-walk the values that fell outside range(size)
+        outside = values >= self.size
+        while outside.any():
+            values[outside] = self._feistel(values[outside])
+            outside = values >= self.size
+        return values.astype(np.int64)
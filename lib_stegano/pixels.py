@@ -0,0 +1,269 @@
+# Vectorized LSB engine for lossless pixel formats (PNG, lossless WebP).
+#
+# The image is converted to a NumPy array once, every selected LSB is read or
+# written with a single gather/scatter, and the result is copied back into the
+# PIL image. In low-memory mode (very large upscaled images) SparsePixels
+# stands in for that array and only touches the selected pixels of the PIL
+# image, so no full-size copy is made.
+#
+# Pixels are visited in the order of a keyed permutation and the stream starts
+# with the payload header, which tells the reader the image uses that order
+# and how many bytes follow. Images without it are read with the legacy
+# full-image shuffle (get_pixel_order) and a NUL terminated message.
+
+import random
+import numpy as np
+
+from lib_stegano import payload
+from lib_stegano.permutation import KeyedPermutation
+from lib_stegano.timing import set_payload_bits, stage
+
+# Pixels read per step while looking for the message delimiter. Multiples of 8
+# so that every chunk holds a whole number of bytes (3 bits per pixel).
+EXTRACT_FIRST_CHUNK = 64
+EXTRACT_CHUNK = 8192
+
+# Payload bits checked by a sampled verification, besides the header
+VERIFY_SAMPLE_BITS = 4096
+
+# Rough working memory per pixel of the array path (RGB conversion, array
+# and bytes copies) and of the legacy order (Python list and index arrays)
+ARRAY_BYTES_PER_PIXEL = 10
+LEGACY_ORDER_BYTES_PER_PIXEL = 64
+
+
+def get_pixel_order(width, height, seed):
+    """Return the legacy shuffled pixel order as flat row-major indices.
+
+    The permutation is the same one produced by shuffling the list of
+    (x, y) tuples enumerated column by column, so legacy images still decode.
+    A private random.Random gives the order of random.seed(seed) followed by
+    random.shuffle without touching the global state.
+    """
+    order = list(range(width * height))
+    random.Random(seed).shuffle(order)
+    order = np.array(order, dtype=np.int64)
+    # order holds x * height + y, convert it to y * width + x
+    return (order % height) * width + order // height
+
+
+def image_to_array(img):
+    """Return a writable (height * width, channels) uint8 view of the image."""
+    if img.mode not in ('RGB', 'RGBA'):
+        img = img.convert('RGB')
+    pixels = np.array(img, dtype=np.uint8)
+    return pixels.reshape(-1, pixels.shape[-1])
+
+
+class SparsePixels:
+    """(height * width, channels) pixel view of a PIL image without a copy.
+
+    Supports the pixels[idx, channels] reads and writes of the engine by
+    accessing only the pixels in idx. The image must be RGB or RGBA.
+    """
+
+    def __init__(self, img):
+        width, height = img.size
+        self.img = img
+        self.width = width
+        self.access = img.load()
+        self.shape = (width * height, len(img.getbands()))
+
+    def __len__(self):
+        return self.shape[0]
+
+    def _coords(self, idx):
+        idx = np.asarray(idx, dtype=np.int64)
+        return zip((idx % self.width).tolist(), (idx // self.width).tolist())
+
+    def __getitem__(self, key):
+        idx, channels = key
+        access = self.access
+        values = np.array([access[xy] for xy in self._coords(idx)], dtype=np.uint8).reshape(-1, self.shape[1])
+        if isinstance(channels, slice):
+            return values[:, channels]
+        return values[np.arange(len(values)), channels]
+
+    def __setitem__(self, key, values):
+        idx, channels = key
+        rows = self[idx, :]
+        rows[:, channels] = values
+        # putpixel copies images that share a read-only buffer on first write
+        putpixel = self.img.putpixel
+        for xy, row in zip(self._coords(idx), rows.tolist()):
+            putpixel(xy, tuple(row))
+        self.access = self.img.load()
+
+
+def pixel_view(img, low_memory=False):
+    """Return the pixels of an RGB/RGBA image as an array, or as SparsePixels in low-memory mode."""
+    return SparsePixels(img) if low_memory else image_to_array(img)
+
+
+def payload_pixels(count, seed, bits):
+    """Indices of the pixels, out of count, that hold the first bits bits of a keyed payload."""
+    return KeyedPermutation(count, seed)[:-(-bits // 3)]
+
+
+def embed_bits(pixels, bits, order):
+    """Write bits into the RGB LSBs of the pixels in order, in place."""
+    bits = bits[:3 * len(order)]
+    idx = order[:-(-len(bits) // 3)]
+    channels = pixels[idx, :3].reshape(-1)
+    channels[:len(bits)] = (channels[:len(bits)] & 0xFE) | bits
+    pixels[idx, :3] = channels.reshape(-1, 3)
+    return pixels
+
+
+def read_bits(pixels, order, start, count):
+    """Read count LSBs starting at bit position start of the stream."""
+    first = start // 3
+    last = min(-(-(start + count) // 3), len(order))
+    bits = pixels[order[first:last], :3].reshape(-1) & 1
+    return bits[start - first * 3:start - first * 3 + count]
+
+
+def extract_bytes(pixels, order):
+    """Read LSB bytes along order until the first NUL byte."""
+    data = bytearray()
+    start, step = 0, EXTRACT_FIRST_CHUNK
+    while start < len(order):
+        bits = pixels[order[start:start + step], :3].reshape(-1) & 1
+        chunk = payload.from_bits(bits)
+        end = chunk.find(b'\0')
+        data += chunk if end == -1 else chunk[:end]
+        if end != -1:
+            break
+        start, step = start + step, min(step * 2, EXTRACT_CHUNK)
+    return bytes(data)
+
+
+def capacity(img):
+    """Return the number of bits the image can hold (one per RGB channel)."""
+    width, height = img.size
+    return 3 * width * height
+
+
+def embed(img, message, seed, legacy=False, compress=False, timer=None, low_memory=False):
+    """Embed a message in the image and return it as RGB.
+
+    legacy=True writes the old format (full shuffle, NUL terminated).
+    compress=True zlib compresses the payload when that makes it shorter.
+    low_memory=True writes the selected pixels in place and keeps RGBA
+    images RGBA. Raises payload.CapacityError if the message does not fit.
+    timer is an optional timing.StageTimer.
+    """
+    if not legacy:
+        return embed_payload(img, payload.encode(message, compress), seed, timer, low_memory)
+    with stage(timer, "decode"):
+        if img.mode != 'RGB' and not (low_memory and img.mode == 'RGBA'):
+            img = img.convert('RGB')
+        width, height = img.size
+        pixels = pixel_view(img, low_memory)
+    bits = payload.text_to_bits(message + '\0')
+    with stage(timer, "shuffle"):
+        order = get_pixel_order(width, height, seed)
+    set_payload_bits(timer, len(bits))
+    with stage(timer, "embed"):
+        embed_bits(pixels, bits, order)
+        if not low_memory:
+            img.frombytes(pixels.tobytes())
+    return img
+
+
+def embed_payload(img, data, seed, timer=None, low_memory=False):
+    """Embed encoded payload bytes (header included) in keyed order; see embed."""
+    with stage(timer, "decode"):
+        if img.mode != 'RGB' and not (low_memory and img.mode == 'RGBA'):
+            img = img.convert('RGB')
+        pixels = pixel_view(img, low_memory)
+    bits = payload.to_bits(data)
+    if len(bits) > capacity(img):
+        raise payload.CapacityError(f"message needs {len(bits)} bits, the image holds {capacity(img)}")
+    with stage(timer, "select"):
+        order = payload_pixels(len(pixels), seed, len(bits))
+    set_payload_bits(timer, len(bits))
+    with stage(timer, "embed"):
+        embed_bits(pixels, bits, order)
+        if not low_memory:
+            img.frombytes(pixels.tobytes())
+    return img
+
+
+def verify(img, message, seed, compress=False, sample=None, low_memory=False):
+    """Check that img holds message, reading the in-memory pixels.
+
+    Compares every payload bit, or with sample=n the header and n randomly
+    chosen payload bits. Returns True if they all match.
+    """
+    return verify_payload(img, payload.encode(message, compress), seed, sample, low_memory)
+
+
+def verify_payload(img, data, seed, sample=None, low_memory=False):
+    """Check that img holds the encoded payload bytes data; see verify."""
+    pixels = pixel_view(img, low_memory and img.mode in ('RGB', 'RGBA'))
+    expected = payload.to_bits(data)
+    if len(expected) > 3 * len(pixels):
+        return False
+    if sample is None or payload.HEADER_BITS + sample >= len(expected):
+        positions = np.arange(len(expected))
+    else:
+        rest = np.random.default_rng().choice(len(expected) - payload.HEADER_BITS, sample, replace=False)
+        positions = np.concatenate([np.arange(payload.HEADER_BITS), payload.HEADER_BITS + np.sort(rest)])
+    order = KeyedPermutation(len(pixels), seed)
+    bits = pixels[order.take(positions // 3), positions % 3] & 1
+    return bool(np.array_equal(bits, expected[positions]))
+
+
+def read_header(pixels, seed, order=None):
+    """Return (version, flags, length) of the header written with seed, or None."""
+    if order is None:
+        order = KeyedPermutation(len(pixels), seed)
+    return payload.parse_header(payload.from_bits(read_bits(pixels, order, 0, payload.HEADER_BITS)))
+
+
+def read_payload(pixels, seed):
+    """Read the headed payload in keyed order.
+
+    Returns (flags, payload bytes), or None if the image has no header.
+    """
+    order = KeyedPermutation(len(pixels), seed)
+    header = read_header(pixels, seed, order)
+    if header is None:
+        return None
+    _, flags, length = header
+    bits = read_bits(pixels, order, payload.HEADER_BITS, 8 * length)
+    return flags, payload.from_bits(bits)
+
+
+def extract_payload(img, seed, low_memory=False):
+    """Return (flags, payload bytes) of the headed payload, or None."""
+    return read_payload(pixel_view(img, low_memory and img.mode in ('RGB', 'RGBA')), seed)
+
+
+def extract(img, seed, legacy=True, timer=None, low_memory=False, details=None):
+    """Extract the message from the image.
+
+    With legacy=False, images without a payload header return None after
+    reading the header bits instead of falling back to the legacy format.
+    low_memory=True reads only the payload pixels of RGB/RGBA images.
+    If details is a dict, the pixel order that held the message is stored
+    in details["scheme"] ("keyed" or "legacy").
+    """
+    if details is None:
+        details = {}
+    width, height = img.size
+    with stage(timer, "decode"):
+        pixels = pixel_view(img, low_memory and img.mode in ('RGB', 'RGBA'))
+    with stage(timer, "read"):
+        found = read_payload(pixels, seed)
+    if found is not None:
+        details["scheme"] = "keyed"
+        return payload.decode(found[1], found[0])
+    if not legacy:
+        return None
+    details["scheme"] = "legacy"
+    with stage(timer, "shuffle"):
+        order = get_pixel_order(width, height, seed)
+    with stage(timer, "read"):
+        return payload.decode_legacy(extract_bytes(pixels, order))
@@ -0,0 +1,191 @@
+# Multi-seed reveal scan.
+#
+# The image is decoded once and the LSBs of its candidate positions (the
+# usable DCT coefficients of a JPEG, the RGB channels of a PNG or lossless
+# WebP) are kept as a plane. Each seed is then tested by reading only the
+# HEADER_BITS bits of the payload header along that seed's order; the rest of
+# the payload is decoded only for seeds with a valid header. Seeds are spread
+# over a process pool, or over threads inside the WebUI, whose process must
+# not be forked (it is multi-threaded and holds the CUDA context).
+#
+# Legacy images have no header, so they cannot be told apart from noise and
+# are not scanned.
+#
+# probe_file only answers whether a file holds a payload: it reads the header
+# bits for each seed and never the payload. PNG and WebP files are read
+# through pixels.SparsePixels, so only the header pixels are converted.
+
+import multiprocessing
+import os
+from concurrent.futures import ThreadPoolExecutor
+from functools import partial
+
+import numpy as np
+
+from lib_stegano import core, jpeg, payload, pixels
+
+# Upper bound on the number of seeds of one scan
+MAX_SEEDS = 1000000
+
+# Seeds handed to a pool worker at a time
+CHUNK_SEEDS = 64
+
+# Plane of the image being scanned, set in each pool worker
+_plane = None
+
+
+def parse_seeds(text):
+    """Parse "0-999, 1234, 5000-5010" into a list of seeds."""
+    seeds = []
+    for part in str(text).replace(";", ",").split(","):
+        part = part.strip()
+        if not part:
+            continue
+        first, sep, last = part.partition("-")
+        if sep and first.strip():
+            first, last = int(first), int(last)
+            if last < first:
+                raise ValueError(f"empty seed range {part}")
+            seeds.extend(range(first, last + 1))
+        else:
+            seeds.append(int(part))
+        if len(seeds) > MAX_SEEDS:
+            raise ValueError(f"more than {MAX_SEEDS} seeds")
+    return seeds
+
+
+def jpeg_plane(img):
+    """LSBs of the usable coefficients of all components, in concatenation order."""
+    arrays = img["coef_arrays"]
+    dct = np.concatenate([a.ravel() for a in arrays])
+    return "jpeg", jpeg.read_bits(dct, jpeg.component_indices(arrays))
+
+
+def png_plane(img):
+    """LSBs of the RGB channels, one row per pixel."""
+    return "png", pixels.image_to_array(img)[:, :3] & 1
+
+
+def check_jpeg(plane, seed):
+    # The plane holds the LSBs of the usable coefficients, in the order the
+    # keyed permutation indexes
+    order = pixels.KeyedPermutation(len(plane), seed)
+    header = payload.parse_header(payload.from_bits(plane[order[:payload.HEADER_BITS]]))
+    if header is None or payload.HEADER_BITS + 8 * header[2] > len(plane):
+        return None
+    _, flags, length = header
+    bits = plane[order[payload.HEADER_BITS:payload.HEADER_BITS + 8 * length]]
+    return payload.decode(payload.from_bits(bits), flags)
+
+
+def check_png(plane, seed):
+    order = pixels.KeyedPermutation(len(plane), seed)
+    header = payload.parse_header(payload.from_bits(pixels.read_bits(plane, order, 0, payload.HEADER_BITS)))
+    if header is None:
+        return None
+    _, flags, length = header
+    if payload.HEADER_BITS + 8 * length > 3 * len(plane):
+        return None
+    return payload.decode(payload.from_bits(pixels.read_bits(plane, order, payload.HEADER_BITS, 8 * length)), flags)
+
+
+def check_seed(plane, seed):
+    """Return the message hidden with seed, or None."""
+    fmt, data = plane
+    try:
+        return check_jpeg(data, seed) if fmt == "jpeg" else check_png(data, seed)
+    except ValueError:
+        # A random header that passed the magic check, with a corrupt payload
+        return None
+
+
+def _init_worker(plane):
+    global _plane
+    _plane = plane
+
+
+def check_chunk(plane, seeds):
+    found = []
+    for seed in seeds:
+        message = check_seed(plane, seed)
+        if message is not None:
+            found.append((seed, message))
+    return found
+
+
+def _check_chunk(seeds):
+    return check_chunk(_plane, seeds)
+
+
+def scan_plane(plane, seeds, workers=None, threads=False):
+    """Test every seed against plane; returns [(seed, message)] in seed order.
+
+    threads=True uses a thread pool instead of a process pool.
+    """
+    chunks = [seeds[i:i + CHUNK_SEEDS] for i in range(0, len(seeds), CHUNK_SEEDS)]
+    workers = min(workers or os.cpu_count() or 1, len(chunks))
+    if workers <= 1:
+        results = [check_chunk(plane, chunk) for chunk in chunks]
+    elif threads:
+        with ThreadPoolExecutor(workers) as executor:
+            results = list(executor.map(partial(check_chunk, plane), chunks))
+    else:
+        with multiprocessing.Pool(workers, initializer=_init_worker, initargs=(plane,)) as pool:
+            results = pool.map(_check_chunk, chunks)
+    return [found for chunk in results for found in chunk]
+
+
+def probe_plane(path):
+    """Decode an image file for probe_header: (format, LSB plane or pixel view)."""
+    if path.lower().endswith(core.JPEG_EXTENSIONS):
+        return jpeg_plane(core.load_jpeg(path))
+    if path.lower().endswith(core.PIXEL_EXTENSIONS):
+        img = core.open_image(path)
+        if img.mode not in ("RGB", "RGBA"):
+            return "png", pixels.image_to_array(img)
+        return "png", pixels.SparsePixels(img)
+    raise ValueError(f"unsupported file type: {path}")
+
+
+def probe_header(plane, seed):
+    """Return (version, flags, length) of the header written with seed, or None."""
+    fmt, data = plane
+    order = pixels.KeyedPermutation(len(data), seed)
+    if fmt == "jpeg":
+        header = payload.parse_header(payload.from_bits(data[order[:payload.HEADER_BITS]]))
+        if header is None or payload.HEADER_BITS + 8 * header[2] > len(data):
+            return None
+        return header
+    header = payload.parse_header(payload.from_bits(pixels.read_bits(data, order, 0, payload.HEADER_BITS)))
+    if header is None or payload.HEADER_BITS + 8 * header[2] > 3 * len(data):
+        return None
+    return header
+
+
+def probe_file(path, seeds):
+    """Return the first of seeds with a payload header in path, or None.
+
+    The result is {"seed", "version", "flags", "length"}; length is the
+    payload size in bytes.
+    """
+    plane = probe_plane(path)
+    for seed in seeds:
+        header = probe_header(plane, seed)
+        if header is not None:
+            version, flags, length = header
+            return {"seed": seed, "version": version, "flags": flags, "length": length}
+    return None
+
+
+def load_plane(path):
+    """Decode an image file once and return its LSB plane."""
+    if path.lower().endswith(core.JPEG_EXTENSIONS):
+        return jpeg_plane(core.load_jpeg(path))
+    if path.lower().endswith(core.PIXEL_EXTENSIONS):
+        return png_plane(core.open_image(path))
+    raise ValueError(f"unsupported file type: {path}")
+
+
+def scan_file(path, seeds, workers=None, threads=False):
+    """Return every (seed, message) found in the image file for the given seeds; see scan_plane."""
+    return scan_plane(load_plane(path), seeds, workers, threads)
@@ -0,0 +1,153 @@
+# Optional per-stage timing for hide/reveal calls.
+#
+# A StageTimer collects the duration of each stage (decode, index selection,
+# shuffle, LSB write, encode, verification...) of one call and, when the call
+# finishes, emits one structured record and adds it to the process-wide
+# TimingStats. The stats keep counters and a bounded window of samples per
+# (operation, format, stage) and report percentiles, so hot stages show up
+# without a profiler attached.
+#
+# Timing is off unless STEGANO_TIMING=1 is set or a caller asks for it; the
+# codecs take timer=None and then skip all bookkeeping.
+
+import json
+import math
+import os
+import threading
+import time
+from collections import defaultdict, deque
+from contextlib import contextmanager, nullcontext
+
+enabled = os.environ.get("STEGANO_TIMING", "") not in ("", "0")
+
+# Samples kept per (operation, format, stage)
+MAX_SAMPLES = 1000
+
+
+class StageTimer:
+    """Collects the stage durations of one hide/reveal call."""
+
+    def __init__(self, operation, file, fmt):
+        try:
+            size = os.path.getsize(file)
+        except (OSError, TypeError):
+            size = None
+        self.record = {"operation": operation, "file": file, "format": fmt, "size": size,
+                       "payload_bits": None, "stages": {}}
+        self.start = time.perf_counter()
+
+    @contextmanager
+    def stage(self, name):
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            stages = self.record["stages"]
+            stages[name] = stages.get(name, 0.0) + time.perf_counter() - start
+
+    def finish(self, log=print, error=None):
+        """Close the record, add it to stats and log it as one JSON line."""
+        self.record["total"] = time.perf_counter() - self.start
+        if error is not None:
+            self.record["error"] = str(error)
+        stats.add(self.record)
+        log("[stegano] timing " + json.dumps(self.record, ensure_ascii=False))
+        return self.record
+
+
+def start(operation, file, fmt, force=False):
+    """Return a StageTimer if timing is enabled (or forced), else None."""
+    if enabled or force:
+        return StageTimer(operation, file, fmt)
+    return None
+
+
+def stage(timer, name):
+    """Context manager timing a stage on timer; does nothing for None."""
+    return timer.stage(name) if timer is not None else nullcontext()
+
+
+def set_payload_bits(timer, bits):
+    if timer is not None:
+        timer.record["payload_bits"] = int(bits)
+
+
+def percentile(sorted_values, q):
+    """Nearest-rank percentile of an already sorted list."""
+    if not sorted_values:
+        return None
+    rank = max(0, math.ceil(q / 100 * len(sorted_values)) - 1)
+    return sorted_values[rank]
+
+
+class TimingStats:
+    """Thread-safe counters and per-stage sample windows."""
+
+    def __init__(self, max_samples=MAX_SAMPLES):
+        self.max_samples = max_samples
+        self.lock = threading.Lock()
+        self.reset()
+
+    def reset(self):
+        with self.lock:
+            self.counts = defaultdict(int)
+            self.errors = defaultdict(int)
+            self.samples = defaultdict(lambda: deque(maxlen=self.max_samples))
+            self.recent = deque(maxlen=100)
+
+    def add(self, record):
+        key = (record["operation"], record["format"])
+        with self.lock:
+            self.counts[key] += 1
+            if "error" in record:
+                self.errors[key] += 1
+            for name, seconds in record["stages"].items():
+                self.samples[key + (name,)].append(seconds)
+            self.samples[key + ("total",)].append(record["total"])
+            self.recent.append(record)
+
+    def query(self, operation=None, fmt=None, stage=None):
+        """Return summary rows (count, mean and percentiles in ms) matching the filters."""
+        with self.lock:
+            items = [(key, sorted(values)) for key, values in self.samples.items()]
+        rows = []
+        for (op, f, name), values in sorted(items):
+            if (operation and op != operation) or (fmt and f != fmt) or (stage and name != stage):
+                continue
+            rows.append({
+                "operation": op, "format": f, "stage": name, "samples": len(values),
+                "mean_ms": 1000 * sum(values) / len(values),
+                "p50_ms": 1000 * percentile(values, 50),
+                "p90_ms": 1000 * percentile(values, 90),
+                "p99_ms": 1000 * percentile(values, 99),
+                "max_ms": 1000 * values[-1],
+            })
+        return rows
+
+    def summary(self):
+        """Return counters and the per-stage summary as a dict."""
+        with self.lock:
+            counts = {f"{op}/{f}": n for (op, f), n in self.counts.items()}
+            errors = {f"{op}/{f}": n for (op, f), n in self.errors.items()}
+        return {"counts": counts, "errors": errors, "stages": self.query()}
+
+    def format_table(self):
+        """Return the summary as plain text, slowest p90 first."""
+        rows = sorted(self.query(), key=lambda row: -row["p90_ms"])
+        if not rows:
+            return "No timings recorded."
+        lines = [f"{'operation':<10}{'format':<7}{'stage':<10}{'n':>6}{'mean':>10}{'p50':>10}{'p90':>10}{'p99':>10}"]
+        for row in rows:
+            lines.append(f"{row['operation']:<10}{row['format']:<7}{row['stage']:<10}{row['samples']:>6}"
+                         f"{row['mean_ms']:>10.1f}{row['p50_ms']:>10.1f}{row['p90_ms']:>10.1f}{row['p99_ms']:>10.1f}")
+        return "\n".join(lines)
+
+    def dump(self, path):
+        """Write the summary and the most recent records to a JSON file."""
+        with self.lock:
+            recent = list(self.recent)
+        with open(path, "w", encoding="utf-8") as f:
+            json.dump({"summary": self.summary(), "recent": recent}, f, indent=1, ensure_ascii=False)
+
+
+stats = TimingStats()
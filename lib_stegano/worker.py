@@ -0,0 +1,105 @@
+# Bounded background worker pool for the save hook.
+#
+# Jobs are queued with a fixed capacity: when the queue is full, submit()
+# blocks the caller until a slot frees up. Every job gets its own log buffer
+# and the buffers are printed in submission order once the job and all jobs
+# before it have finished, so the console reads the same as in synchronous
+# mode. A job that raises counts as failed; jobs that handle a failure
+# themselves raise LeftUnchanged after logging it, so no traceback is added.
+
+import itertools
+import queue
+import threading
+import traceback
+
+
+class LeftUnchanged(Exception):
+    """Raised by a stamp job that left its file unchanged and logged why."""
+
+
+class StampWorker:
+    """Runs jobs on a bounded queue served by a small thread pool."""
+
+    def __init__(self, workers=1, max_pending=16, log=print):
+        self.log = log
+        self.jobs = queue.Queue(maxsize=max_pending)
+        self.counter = itertools.count()
+        self.lock = threading.Lock()
+        self.next_to_log = 0
+        self.finished = {}
+        self.running = 0
+        self.completed = 0
+        self.failed = 0
+        self.errors = []
+        self.threads = []
+        for i in range(workers):
+            thread = threading.Thread(target=self._run, name=f"stegano-worker-{i}", daemon=True)
+            thread.start()
+            self.threads.append(thread)
+
+    def submit(self, name, func, *args):
+        """Queue func(*args, log=...) and block while the queue is full."""
+        with self.lock:
+            seq = next(self.counter)
+        self.jobs.put((seq, name, func, args))
+        return seq
+
+    def _run(self):
+        while True:
+            job = self.jobs.get()
+            if job is None:
+                self.jobs.task_done()
+                return
+            seq, name, func, args = job
+            lines = []
+            with self.lock:
+                self.running += 1
+            try:
+                func(*args, log=lines.append)
+                error = None
+            except LeftUnchanged as e:
+                error = f"{name}: {e}"
+            except Exception as e:
+                error = f"{name}: {e}"
+                lines.append(f"[stegano] Failed to process {name}: {e}")
+                lines.append(traceback.format_exc())
+            self._finish(seq, lines, error)
+            self.jobs.task_done()
+
+    def _finish(self, seq, lines, error):
+        with self.lock:
+            self.running -= 1
+            if error is None:
+                self.completed += 1
+            else:
+                self.failed += 1
+                self.errors = (self.errors + [error])[-10:]
+            self.finished[seq] = lines
+            # Print every finished job whose predecessors are done
+            while self.next_to_log in self.finished:
+                for line in self.finished.pop(self.next_to_log):
+                    self.log(line)
+                self.next_to_log += 1
+
+    def flush(self):
+        """Block until every queued job has finished."""
+        self.jobs.join()
+
+    def shutdown(self):
+        """Finish the queued jobs and stop the worker threads."""
+        for _ in self.threads:
+            self.jobs.put(None)
+        for thread in self.threads:
+            thread.join()
+        self.threads = []
+
+    def status(self):
+        """Return queue depth and counters as a dict."""
+        with self.lock:
+            return {
+                "queued": self.jobs.qsize(),
+                "running": self.running,
+                "completed": self.completed,
+                "failed": self.failed,
+                "recent_errors": list(self.errors),
+            }
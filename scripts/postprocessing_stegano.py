@@ -29,171 +29,188 @@
 # by Vojtěch Holub, Jessica Fridrich and Tomáš Denemark.
 
 import os
-import subprocess
-import io
-import gradio as gr
-import random
-import numpy as np
-from PIL import Image, PngImagePlugin
-import jpeg_toolbox as jt
-from math import gcd
+import atexit
 
-from modules import images, sd_samplers, scripts_postprocessing, shared, script_callbacks
+from modules import scripts_postprocessing, script_callbacks
 from modules.ui_components import FormRow, ToolButton
 from modules import paths_internal
 
-postprocessing_callback = None
-callback_registered = False
+from lib_stegano import core, jpeg, payload, timing
+from lib_stegano.worker import LeftUnchanged, StampWorker
 
-def text_to_bits(text):
-    """Convert text to a binary list."""
-    bit_list = []
-    for char in text:
-        bits = bin(ord(char))[2:].zfill(8)
-        bit_list.extend([int(bit) for bit in bits])
-    return bit_list
+# Background mode: jobs are processed off the generation thread by a few
+# worker threads; every codec call uses its own random.Random, so they can
+# run concurrently.
+BACKGROUND_WORKERS = min(4, os.cpu_count() or 1)
+BACKGROUND_QUEUE_SIZE = 16
 
-def bits_to_text(bits):
-    """Convert a binary list to text."""
-    chars = []
-    for b in range(len(bits) // 8):
-        byte = bits[b*8:(b+1)*8]
-        byte_str = ''.join([str(bit) for bit in byte])
-        chars.append(chr(int(byte_str, 2)))
-    return ''.join(chars)
+postprocessing_callback = None
+before_save_callback = None
+callback_registered = False
+stamp_worker = None
 
-def jpeg_lsbr_hide(image_path, seed, message):
+def jpeg_lsbr_hide(image_path, seed, message, compress=False, timer=None):
     """Embeds a hidden message in a JPEG image using J-UNIWARD."""
-    # Convert the message to a binary list
-    message += '\0'  # Add delimiter
-    msg_bit_list = text_to_bits(message)
-
-    # Load the JPEG image using jpeg_toolbox
-    img = jt.load(image_path)
-
-    dct = img["coef_arrays"][0]
-    d1, d2 = dct.shape
-
-    dct_copy = dct.copy()
-    # Do not use 0 and 1 coefficients
-    dct_copy[np.abs(dct_copy) == 1] = 0
-    # Do not use the DC DCT coefficients
-    dct_copy[::8, ::8] = 0
-    # Flatten the array
-    dct = dct.flatten()
-    dct_copy = dct_copy.flatten()
-    # Index of the DCT coefficients we can change
-    idx = np.where(dct_copy != 0)[0]
-
-    # Select a pseudorandom set of DCT coefficients to hide the message
-    random.seed(int(seed))
-    random.shuffle(idx)
-    l = min(len(idx), len(msg_bit_list))
-    idx = idx[:l]
-    msg = np.array(msg_bit_list[:l])
-
-    # LSB replacement:
-    # Put LSBs to 0
-    dct[idx] = np.sign(dct[idx]) * (np.abs(dct[idx]) - np.abs(dct[idx] % 2))
-    # Add the value of the message
-    dct[idx] = np.sign(dct[idx]) * (np.abs(dct[idx]) + msg)
-
-    # Reshape and save DCTs
-    dct = dct.reshape((d1, d2))
-    img["coef_arrays"][0] = dct
-    return img
+    return core.jpeg_hide_file(image_path, seed, message, compress, timer)
 
 def jpeg_lsbr_unhide(image,seed):
     """Extracts a hidden message from a JPEG image using LSB."""
-    # Load the JPEG image using jpeg_toolbox
-    img = jt.load(image)
+    return core.jpeg_unhide_file(image, seed)
 
-    dct = img["coef_arrays"][0]
-    d1, d2 = dct.shape
+# This portion of the code deal with the PNG format.
+def embed_message(image_path, message, seed, log=print, compress=False, timer=None):
+    # Keep the metadata
+    core.png_embed_file(image_path, message, seed, text={"parameters": message}, compress=compress, timer=timer)
+    log("[stegano] Message embedded successfully.")
 
-    dct_copy = dct.copy()
-    # Do not use 0 and 1 coefficients
-    dct_copy[np.abs(dct_copy) == 1] = 0
-    # Do not use the DC DCT coefficients
-    dct_copy[::8, ::8] = 0
-    # Flatten the array
-    dct = dct.flatten()
-    dct_copy = dct_copy.flatten()
-    # Index of the DCT coefficients we can change
-    idx = np.where(dct_copy != 0)[0]
+def extract_message(image_path, seed):
+    return core.png_extract_file(image_path, seed)
 
-    # Select a pseudorandom set of DCT coefficients
-    random.seed(int(seed))
-    random.shuffle(idx)
-    l = len(idx)
+def stamp_file(filename, full_path, message, seed, geninfo, compress=False, timed=False,
+               verify="full", png_compress_level=core.PNG_COMPRESS_LEVEL, png_optimize=False, log=print):
+    """Embed message + geninfo in a saved image and verify it.
 
-    # Read the message
-    msg_bits = dct[idx] % 2
-    message = bits_to_text(msg_bits.astype('uint8').tolist())
-    return message.split('\0')[0]
+    verify is one of core.VERIFY_POLICIES. With timed, the duration of every
+    stage is logged as a structured record and added to timing.stats.
+    Raises LeftUnchanged, after logging the reason, if the file could not be
+    stamped.
+    """
+    timer = timing.start("stamp", full_path, os.path.splitext(filename)[1].lower().lstrip('.'), force=timed)
+    error = None
+    try:
+        stamp_image(filename, full_path, message, seed, geninfo, compress, log, timer,
+                    verify, png_compress_level, png_optimize)
+    except (payload.CapacityError, LeftUnchanged) as e:
+        error = e
+        log(f"[stegano] {filename} left unchanged: {e}.")
+        raise LeftUnchanged(str(e)) from e
+    except Exception as e:
+        error = e
+        raise
+    finally:
+        if timer is not None:
+            timer.finish(log, error)
 
-# This portion of the code deal with the PNG format.
-def get_pixel_order(width, height, seed):
-    pixels = [(x, y) for x in range(width) for y in range(height)]
-    random.seed(seed)
-    random.shuffle(pixels)
-    return pixels
+def stamp_image(filename, full_path, message, seed, geninfo, compress, log, timer=None,
+                verify="full", png_compress_level=core.PNG_COMPRESS_LEVEL, png_optimize=False):
+    if filename.lower().endswith(('.jpg', '.jpeg')): 
+        message_orig = message + " " + geninfo
+        if compress:
+            log(core.compression_report(message_orig))
+        # Decode once, embed and verify on the in-memory coefficients,
+        # then write once. Reading back only touches the payload
+        # coefficients, so "sampled" verifies in full.
+        stegano_image = jpeg_lsbr_hide(full_path, seed, message_orig, compress, timer)
+        if verify != "off":
+            with timing.stage(timer, "verify"):
+                extracted_message = jpeg.unhide(stegano_image, seed, legacy=False,
+                                                low_memory=core.use_low_memory(stegano_image))
+            if not core.check_verification(message_orig, extracted_message, log):
+                raise LeftUnchanged("verification failed")
+        core.save_jpeg(stegano_image, full_path, comment=geninfo, timer=timer)
+        log(f"[stegano] Applied steganography to {filename}.")
+    elif filename.lower().endswith(core.PIXEL_EXTENSIONS):
+        if filename.lower().endswith(core.WEBP_EXTENSIONS) and not core.is_lossless_webp(full_path):
+            # Rewriting a lossy file as lossless would make it much larger
+            raise LeftUnchanged("lossy WebP is not rewritten as lossless")
+        if message:
+            message_orig = message + " " + geninfo
+        else:
+            message_orig = geninfo
+        if compress:
+            log(core.compression_report(message_orig))
+        # Embed and verify on the in-memory pixels, then write once
+        source = core.open_image(full_path)
+        stegano_image = core.png_embed_image(source, message_orig, seed, compress, timer)
+        with timing.stage(timer, "verify"):
+            verified = core.verify_png(stegano_image, message_orig, seed, verify, compress, log)
+        if not verified:
+            raise LeftUnchanged("verification failed")
+        # Keep the metadata: the PNG text chunks, with the stamped message as
+        # parameters, or the EXIF geninfo of WebP files
+        core.save_pixels(stegano_image, full_path, source.info, {"parameters": message_orig},
+                         png_compress_level, png_optimize, timer)
+        log("[stegano] Message embedded successfully.")
+        log(f"[stegano] Applied steganography to {filename}.")
+    else:
+        log(f"[stegano] Unsupported file type: {filename}")
 
-def embed_message(image_path, message, seed):
-    # Keep the metadata
-    extra_meta = PngImagePlugin.PngInfo()
-    extra_meta.add_text("parameters", message)
+def stamp_before_save(params, message, seed, geninfo, compress=False, timed=False, verify="full", log=print):
+    """Embed message + geninfo in the PIL image A1111 is about to save as PNG.
+
+    The stamped image replaces params.image, so the file is encoded once.
+    On a verification failure or if the message does not fit, the image is
+    saved unchanged.
+    """
+    filename = os.path.basename(params.filename)
+    timer = timing.start("stamp", params.filename, "png", force=timed)
+    error = None
+    try:
+        message_orig = message + " " + geninfo if message else geninfo
+        if compress:
+            log(core.compression_report(message_orig))
+        # Embed in a copy: params.image may also be shown in the gallery.
+        # Low-memory mode writes the few payload pixels in place instead, and
+        # puts them back if the message does not verify.
+        image = params.image if core.use_low_memory(params.image) else params.image.copy()
+        backup = core.backup_pixels(image, message_orig, seed, compress)
+        stegano_image = core.png_embed_image(image, message_orig, seed, compress, timer)
+        with timing.stage(timer, "verify"):
+            verified = core.verify_png(stegano_image, message_orig, seed, verify, compress, log)
+        if not verified:
+            if backup is not None:
+                core.restore_pixels(params.image, backup)
+            log(f"[stegano] {filename} saved without a message.")
+            return
+        params.image = stegano_image
+        # Keep the metadata
+        params.pnginfo["parameters"] = message_orig
+        log(f"[stegano] Applied steganography to {filename} before saving.")
+    except payload.CapacityError as e:
+        error = e
+        log(f"[stegano] {filename} saved without a message: {e}.")
+    except Exception as e:
+        error = e
+        raise
+    finally:
+        if timer is not None:
+            timer.finish(log, error)
 
-    img = Image.open(image_path)
-    width, height = img.size
-    
-    if img.mode != 'RGB':
-        img = img.convert('RGB')
-    
-    message += '\0'
-    binary_message = ''.join(format(ord(char), '08b') for char in message)
-    
-    pixels = get_pixel_order(width, height, seed)
-    
-    data_index = 0
-    for x, y in pixels:
-        pixel = list(img.getpixel((x, y)))
-        for color_channel in range(3):
-            if data_index < len(binary_message):
-                pixel[color_channel] = (pixel[color_channel] & 0xFE) | int(binary_message[data_index])
-                data_index += 1
-        img.putpixel((x, y), tuple(pixel))
-        if data_index >= len(binary_message):
-            break
-    
-    img.save(image_path, pnginfo=extra_meta)
-    print("[stegano] Message embedded successfully.")
+def get_stamp_worker():
+    """Return the background worker, starting it on first use."""
+    global stamp_worker
+    if stamp_worker is None:
+        stamp_worker = StampWorker(workers=BACKGROUND_WORKERS, max_pending=BACKGROUND_QUEUE_SIZE)
+        atexit.register(stamp_worker.shutdown)
+        script_callbacks.on_script_unloaded(shutdown_stamp_worker)
+    return stamp_worker
 
-def extract_message(image_path, seed):
-    img = Image.open(image_path)
-    width, height = img.size
-    
-    pixels = get_pixel_order(width, height, seed)
-    
-    binary_message = ""
-    extracted_message = ""
-    for x, y in pixels:
-        pixel = img.getpixel((x, y))
-        for color_channel in range(3):
-            binary_message += str(pixel[color_channel] & 1)
-            if len(binary_message) == 8:
-                char = chr(int(binary_message, 2))
-                if char == '\0':
-                    return extracted_message
-                extracted_message += char
-                binary_message = ""
-    return extracted_message
+def shutdown_stamp_worker():
+    """Flush the pending jobs and stop the background worker."""
+    global stamp_worker
+    if stamp_worker is not None:
+        stamp_worker.shutdown()
+        stamp_worker = None
 
-def create_postprocessing_callback(message, enabled, seed, include_image_info):
+def background_status():
+    if stamp_worker is None:
+        return "Background processing has not been used yet."
+    status = stamp_worker.status()
+    lines = [f"Queued: {status['queued']}, running: {status['running']}, "
+             f"completed: {status['completed']}, failed: {status['failed']}"]
+    lines.extend(status["recent_errors"])
+    return "\n".join(lines)
+
+def create_postprocessing_callback(message, enabled, seed, include_image_info, background=False, compress=False, timed=False,
+                                   verify="full", png_compress_level=core.PNG_COMPRESS_LEVEL, png_optimize=False,
+                                   before_save=False):
     def my_postprocessing_callback(params):
         # print(f"[stegano] passed: message={message}, enabled={enabled}, seed={seed}, include={include_image_info}")
         if not enabled:
             return
+        if before_save and params.filename.lower().endswith(core.PNG_EXTENSIONS):
+            # Already stamped by the before-save callback
+            return
         if not message and not include_image_info:
             print("[stegano] Message cannot be blank.")
             return
@@ -202,50 +219,55 @@ def create_postprocessing_callback(message, enabled, seed, include_image_info):
         geninfo = pnginfo.get('parameters', '')
         work_path = os.path.dirname(paths_internal.data_path)
         full_path = os.getcwd() + "/" + params.filename
-        if params.filename.lower().endswith(('.jpg', '.jpeg')): 
-            print(f"[stegano] Applied steganography to {params.filename}.")
-            source = jt.load(full_path)
-            message_orig = message + " " + geninfo
-            stegano_image = jpeg_lsbr_hide(full_path, seed, message_orig)
-            jt.save(stegano_image, full_path)
-            jt.add_user_comment(full_path,geninfo)
-            extracted_message = jpeg_lsbr_unhide(full_path, seed)
-            if extracted_message == message_orig:
-                print("[stegano] Verification successful. Embedded and extracted messages match.")
-            else:
-                print("[stegano] Verification failed. Embedded and extracted messages do not match.")
-                print(f"[stegano] Original message: {message_orig}")
-                print(f"[stegano] Extracted message: {extracted_message}")
-        elif params.filename.lower().endswith('.png'):
-            if message:
-                message_orig = message + " " + geninfo
-            else:
-                message_orig = geninfo
-            embed_message(full_path, message_orig, seed)
-            extracted_message = extract_message(full_path, seed)
-            if extracted_message == message_orig:
-                print("[stegano] Verification successful. Embedded and extracted messages match.")
-            else:
-                print("[stegano] Verification failed. Embedded and extracted messages do not match.")
-                print(f"[stegano] Original message: {message_orig}")
-                print(f"[stegano] Extracted message: {extracted_message}")
-            print(f"[stegano] Applied steganography to {params.filename}.")
-        elif params.filename.lower().endswith('.webp'):
-            print(f"[stegano] Processing WEBP is not yet supported")
+        if background:
+            # Blocks while the queue is full
+            get_stamp_worker().submit(params.filename, stamp_file, params.filename, full_path, message, seed, geninfo, compress, timed,
+                                     verify, png_compress_level, png_optimize)
         else:
-            print(f"[stegano] Unsupported file type: {params.filename}")
+            try:
+                stamp_file(params.filename, full_path, message, seed, geninfo, compress, timed,
+                           verify, png_compress_level, png_optimize)
+            except LeftUnchanged:
+                # Already logged
+                pass
     return my_postprocessing_callback
 
-def register_callback_once(message, enabled, seed, include_image_info):
-    global postprocessing_callback, callback_registered
+def create_before_save_callback(message, enabled, seed, include_image_info, compress=False, timed=False, verify="full"):
+    """Return the before-image-saved callback that stamps PNG images in memory.
+
+    It runs on the generation thread even in background mode, as the image
+    is encoded right after it returns. JPEG files are left to the post-save
+    callback, which works on the DCT coefficients of the written file.
+    """
+    def my_before_save_callback(params):
+        if not enabled or not params.filename.lower().endswith(core.PNG_EXTENSIONS):
+            return
+        if not message and not include_image_info:
+            print("[stegano] Message cannot be blank.")
+            return
+        geninfo = params.pnginfo.get('parameters', '')
+        stamp_before_save(params, message, seed, geninfo, compress, timed, verify)
+    return my_before_save_callback
+
+def register_callback_once(message, enabled, seed, include_image_info, background=False, compress=False, timed=False,
+                           verify="full", png_compress_level=core.PNG_COMPRESS_LEVEL, png_optimize=False,
+                           before_save=False):
+    global postprocessing_callback, before_save_callback, callback_registered
     if enabled:
         if not callback_registered:
-            postprocessing_callback = create_postprocessing_callback(message, enabled, seed, include_image_info)
+            postprocessing_callback = create_postprocessing_callback(message, enabled, seed, include_image_info, background, compress, timed,
+                                                                    verify, png_compress_level, png_optimize, before_save)
             script_callbacks.on_image_saved(postprocessing_callback)
+            if before_save:
+                before_save_callback = create_before_save_callback(message, enabled, seed, include_image_info, compress, timed, verify)
+                script_callbacks.on_before_image_saved(before_save_callback)
             callback_registered = True
     else:
         if callback_registered:
             script_callbacks.remove_callbacks_for_function(postprocessing_callback)
+            if before_save_callback is not None:
+                script_callbacks.remove_callbacks_for_function(before_save_callback)
+                before_save_callback = None
             callback_registered = False
 
 class ScriptPostprocessingStegano(scripts_postprocessing.ScriptPostprocessing):
@@ -253,6 +275,7 @@ class ScriptPostprocessingStegano(scripts_postprocessing.ScriptPostprocessing):
     order = 9999
 
     def ui(self):
+        import gradio as gr
         
         with gr.Group():
             with gr.Accordion(self.name, open=False, elem_id=id('accordion')):
@@ -260,14 +283,36 @@ class ScriptPostprocessingStegano(scripts_postprocessing.ScriptPostprocessing):
                 seed = gr.Number(label="Seed", value=0)
                 include_image_info = gr.Checkbox(label='Include prompt and geninfo', value=True)
                 message = gr.Textbox(label='Secret Message', value='', placeholder='Enter secret message here...')
+                compress = gr.Checkbox(label='Compress payload', value=False)
+                background = gr.Checkbox(label='Process in background', value=False)
+                before_save = gr.Checkbox(label='Embed PNG before saving (single encode)', value=False)
+                timed = gr.Checkbox(label='Log stage timings', value=timing.enabled)
+                verify = gr.Dropdown(label='Verification', choices=list(core.VERIFY_POLICIES), value='full')
+                with FormRow():
+                    png_compress_level = gr.Slider(label='PNG compression level', minimum=0, maximum=9, step=1,
+                                                   value=core.PNG_COMPRESS_LEVEL)
+                    png_optimize = gr.Checkbox(label='PNG optimize', value=False)
+                with FormRow():
+                    status = gr.Textbox(label='Background status', interactive=False)
+                    refresh = ToolButton(value='\U0001f504')
+                refresh.click(background_status, inputs=[], outputs=[status])
                 
         return {
             "enabled": enabled,
             "seed": seed,
             "include_image_info": include_image_info,
-            "message": message
+            "message": message,
+            "background": background,
+            "compress": compress,
+            "timed": timed,
+            "verify": verify,
+            "png_compress_level": png_compress_level,
+            "png_optimize": png_optimize,
+            "before_save": before_save
         }
 
-    def process(self, pp: scripts_postprocessing.PostprocessedImage, message, enabled, seed, include_image_info):
+    def process(self, pp: scripts_postprocessing.PostprocessedImage, message, enabled, seed, include_image_info, background=False, compress=False, timed=False,
+                verify="full", png_compress_level=core.PNG_COMPRESS_LEVEL, png_optimize=False, before_save=False):
         # print(f"Process called with enabled={enabled}")    
-        register_callback_once(message, enabled, seed, include_image_info)
+        register_callback_once(message, enabled, seed, include_image_info, background, compress, timed,
+                               verify, int(png_compress_level), png_optimize, before_save)
@@ -28,206 +28,176 @@
 # Universal Distortion Function for Steganography in an Arbitrary Domain
 # by Vojtěch Holub, Jessica Fridrich and Tomáš Denemark.
 
-import gradio as gr
-import sys
-import random
-import numpy as np
-import jpeg_toolbox as jt
-from PIL import Image, PngImagePlugin
-import numpy as np
+import hashlib
+import os
 import tempfile
+import time
+import zipfile
+from concurrent.futures import ThreadPoolExecutor, as_completed
+from functools import lru_cache
 
-import modules.generation_parameters_copypaste as parameters_copypaste
-from modules import devices, script_callbacks, shared
+from modules import script_callbacks, shared
+
+from lib_stegano import cache, core, scan, timing
 
 __version__ = "0.0.2"
 
 ci = None
-low_vram = False
-
-gradio_version = tuple(map(int, gr.__version__.split(".")))
-
-def text_to_bits(text):
-    """Convert text to a binary list."""
-    bit_list = []
-    for char in text:
-        bits = bin(ord(char))[2:].zfill(8)
-        bit_list.extend([int(bit) for bit in bits])
-    return bit_list
-
-def bits_to_text(bits):
-    """Convert a binary list to text."""
-    chars = []
-    for b in range(len(bits) // 8):
-        byte = bits[b*8:(b+1)*8]
-        byte_str = ''.join([str(bit) for bit in byte])
-        chars.append(chr(int(byte_str, 2)))
-    return ''.join(chars)
-
-def jpeg_lsbr_hide(image, seed, message):
-    print(f"Image = {image.name}")
-    """Embeds a hidden message in a JPEG image using LSB."""
-    # Convert the message to a binary list
-    message += '\0'  # Add delimiter
-    msg_bit_list = text_to_bits(message)
-
-    # Load the JPEG image using jpeg_toolbox
-    img = jt.load(image.name)
-
-    dct = img["coef_arrays"][0]
-    d1, d2 = dct.shape
-
-    dct_copy = dct.copy()
-    # Do not use 0 and 1 coefficients
-    dct_copy[np.abs(dct_copy) == 1] = 0
-    # Do not use the DC DCT coefficients
-    dct_copy[::8, ::8] = 0
-    # Flatten the array
-    dct = dct.flatten()
-    dct_copy = dct_copy.flatten()
-    # Index of the DCT coefficients we can change
-    idx = np.where(dct_copy != 0)[0]
-
-    # Select a pseudorandom set of DCT coefficients to hide the message
-    random.seed(int(seed))
-    random.shuffle(idx)
-    l = min(len(idx), len(msg_bit_list))
-    idx = idx[:l]
-    msg = np.array(msg_bit_list[:l])
-
-    # LSB replacement:
-    # Put LSBs to 0
-    dct[idx] = np.sign(dct[idx]) * (np.abs(dct[idx]) - np.abs(dct[idx] % 2))
-    # Add the value of the message
-    dct[idx] = np.sign(dct[idx]) * (np.abs(dct[idx]) + msg)
-
-    # Reshape and save DCTs
-    dct = dct.reshape((d1, d2))
-    img["coef_arrays"][0] = dct
-
-    # Save the image to a temporary file
-    temp_file = tempfile.NamedTemporaryFile(suffix=".jpg", delete=False)
-    jt.save(img,temp_file.name)
-
-    # Return the path to the temporary file for download
-    return temp_file.name
-
-def jpeg_lsbr_unhide(image,seed):
-    """Extracts a hidden message from a JPEG image using LSB."""
-    # Load the JPEG image using jpeg_toolbox
-    img = jt.load(image.name)
-
-    dct = img["coef_arrays"][0]
-    d1, d2 = dct.shape
-
-    dct_copy = dct.copy()
-    # Do not use 0 and 1 coefficients
-    dct_copy[np.abs(dct_copy) == 1] = 0
-    # Do not use the DC DCT coefficients
-    dct_copy[::8, ::8] = 0
-    # Flatten the array
-    dct = dct.flatten()
-    dct_copy = dct_copy.flatten()
-    # Index of the DCT coefficients we can change
-    idx = np.where(dct_copy != 0)[0]
-
-    # Select a pseudorandom set of DCT coefficients
-    random.seed(int(seed))
-    random.shuffle(idx)
-    l = len(idx)
-
-    # Read the message
-    msg_bits = dct[idx] % 2
-    message = bits_to_text(msg_bits.astype('uint8').tolist())
-    return message.split('\0')[0]
-
-def get_pixel_order(width, height, seed):
-    pixels = [(x, y) for x in range(width) for y in range(height)]
-    random.seed(seed)
-    random.shuffle(pixels)
-    return pixels
-
-def embed_message(image_path, message, seed):
-    # Keep the metadata
-    extra_meta = PngImagePlugin.PngInfo()
-    extra_meta.add_text("parameters", message)
-
-    img = Image.open(image_path)
-    width, height = img.size
-    
-    if img.mode != 'RGB':
-        img = img.convert('RGB')
-    
-    message += '\0'
-    binary_message = ''.join(format(ord(char), '08b') for char in message)
-    
-    pixels = get_pixel_order(width, height, seed)
-    
-    data_index = 0
-    for x, y in pixels:
-        pixel = list(img.getpixel((x, y)))
-        for color_channel in range(3):
-            if data_index < len(binary_message):
-                pixel[color_channel] = (pixel[color_channel] & 0xFE) | int(binary_message[data_index])
-                data_index += 1
-        img.putpixel((x, y), tuple(pixel))
-        if data_index >= len(binary_message):
-            break
-    
-    img.save(image_path, pnginfo=extra_meta)
-    print("Message embedded successfully.")
-
-def extract_message(image_path, seed):
-    img = Image.open(image_path)
-    width, height = img.size
-    
-    pixels = get_pixel_order(width, height, seed)
-    
-    binary_message = ""
-    extracted_message = ""
-    for x, y in pixels:
-        pixel = img.getpixel((x, y))
-        for color_channel in range(3):
-            binary_message += str(pixel[color_channel] & 1)
-            if len(binary_message) == 8:
-                char = chr(int(binary_message, 2))
-                if char == '\0':
-                    return extracted_message
-                extracted_message += char
-                binary_message = ""
-    return extracted_message
-
-def png_embed_message(image_path, message, seed):
-    embed_message(image_path, message, seed)
-    extracted_message = extract_message(image_path, seed)
-    if extracted_message == message:
-        print("Verification successful. Embedded and extracted messages match.")
-    else:
-        print("Verification failed. Embedded and extracted messages do not match.")
-        print(f"Original message: {message}")
-        print(f"Extracted message: {extracted_message}")
-    print(f"Applied steganography to {image_path}.")
-
-def png_extract_message(image_path, seed):
-    extracted_message = extract_message(image_path, seed)
-    return extracted_message
-
-def image_analysis(image,seed):
-    if image.name.lower().endswith(('.jpg', '.jpeg')): 
-        return jpeg_lsbr_unhide(image,seed)
-    elif image.name.lower().endswith(('.png')): 
-        return png_extract_message(image,seed)
-    else:
-        print(f"Unsupported file type: {image.name}")
-
-def encode_image(image,message,seed):
-    if image.name.lower().endswith(('.jpg', '.jpeg')): 
-        return jpeg_lsbr_hide(image,message,seed)
-    elif image.name.lower().endswith(('.png')): 
-        return png_embed_message(image,message,seed)
-    else:
-        print(f"Unsupported file type: {image.name}")
-   
+# Follow the WebUI's memory flags: process large images without full-size copies
+low_vram = bool(getattr(shared.cmd_opts, "lowvram", False) or getattr(shared.cmd_opts, "medvram", False))
+if low_vram:
+    core.low_memory = True
+
+# Files processed at once by the multi-file Hide/Reveal tabs, and batches of
+# one tab processed at once through the Gradio queue (Gradio 4 and later)
+BATCH_WORKERS = min(4, os.cpu_count() or 1)
+BATCH_CONCURRENCY = 2
+
+# Hide outputs and batch zips are kept in a bounded cache: repeated requests
+# are served from it, and old or least recently used entries are dropped
+CACHE_ROOT = os.path.join(tempfile.gettempdir(), "stegano_cache")
+CACHE_MAX_BYTES = int(os.environ.get("STEGANO_CACHE_MB", "1024")) * 2 ** 20
+CACHE_MAX_AGE = float(os.environ.get("STEGANO_CACHE_HOURS", "24")) * 3600
+
+output_cache = cache.OutputCache(CACHE_ROOT, CACHE_MAX_BYTES, CACHE_MAX_AGE)
+
+@lru_cache(maxsize=None)
+def gradio_version():
+    import gradio as gr
+    return tuple(map(int, gr.__version__.split(".")[:2]))
+
+def upload_path(image):
+    """Return the path of a gr.File value (a path or a tempfile wrapper)."""
+    return getattr(image, "name", image)
+
+def hide_output(image, seed, message, timer=None):
+    """Hide message in an uploaded image; returns (output path, cache hit).
+
+    The output is written once into the output cache and reused for the
+    same file content, seed and message.
+    """
+    path = upload_path(image)
+    key = cache.output_key(path, seed, message)
+    return output_cache.get_or_create(key, os.path.basename(path),
+                                      lambda target: core.hide_file(path, target, seed, message, timer=timer))
+
+def reveal_message(image, seed, timer=None):
+    """Extract the message of an uploaded image, memoized by file content and seed."""
+    path = upload_path(image)
+    result, _ = cache.reveal_memo.reveal(path, seed, lambda: core.reveal_file(path, seed, timer), timer)
+    return result["message"]
+
+def scan_seeds(images, seeds):
+    """Try a list or range of seeds on the images and report those that reveal a message."""
+    if not isinstance(images, list):
+        images = [images]
+    seeds = scan.parse_seeds(seeds)
+    lines = []
+    for image in images:
+        path = upload_path(image)
+        # Threads: forking the WebUI process is not safe
+        found = scan.scan_file(path, seeds, threads=True)
+        prefix = f"{os.path.basename(path)}: " if len(images) > 1 else ""
+        if not found:
+            lines.append(f"{prefix}No message found for these seeds.")
+        lines.extend(f"{prefix}Seed {seed}: {message}" for seed, message in found)
+    return "\n".join(lines)
+
+def unique_names(paths):
+    """File names of paths, numbered on clashes."""
+    names, seen = [], set()
+    for i, path in enumerate(paths):
+        name = os.path.basename(path)
+        if name in seen:
+            name = f"{i + 1}-{name}"
+        seen.add(name)
+        names.append(name)
+    return names
+
+def write_zip(archive, outputs, names):
+    # Images are already compressed
+    with zipfile.ZipFile(archive, "w", zipfile.ZIP_STORED) as zf:
+        for output, name in zip(outputs, names):
+            zf.write(output, name)
+
+def run_batch(operation, paths, func):
+    """Run func(path, index, timer) over paths on a thread pool.
+
+    Yields the result table, one [file, status, result, seconds] row per
+    path, every time a file finishes.
+    """
+    rows = [[os.path.basename(path), "queued", "", ""] for path in paths]
+    yield rows
+
+    def task(index):
+        path = paths[index]
+        timer = timing.start(operation, path, os.path.splitext(path)[1].lower().lstrip('.'))
+        start = time.perf_counter()
+        error = None
+        try:
+            return func(path, index, timer), time.perf_counter() - start
+        except Exception as e:
+            error = e
+            raise
+        finally:
+            if timer is not None:
+                timer.finish(error=error)
+
+    with ThreadPoolExecutor(max_workers=BATCH_WORKERS) as pool:
+        futures = {pool.submit(task, index): index for index in range(len(paths))}
+        for index in range(len(paths)):
+            rows[index][1] = "running"
+        yield rows
+        for future in as_completed(futures):
+            index = futures[future]
+            try:
+                result, seconds = future.result()
+                rows[index][1:] = ["ok", result, f"{seconds:.2f}"]
+            except Exception as e:
+                rows[index][1:] = ["error", f"{type(e).__name__}: {e}", ""]
+            yield rows
+
+def hide_files(files, message, seed):
+    """Embed message in every uploaded file; streams the table, then the outputs and their zip."""
+    paths = [upload_path(f) for f in files or []]
+    names = unique_names(paths)
+    outputs = [None] * len(paths)
+
+    def hide(path, index, timer):
+        outputs[index], hit = hide_output(path, seed, message, timer)
+        return names[index] + (" (cached)" if hit else "")
+
+    for rows in run_batch("hide", paths, hide):
+        yield rows, None
+    done = [(output, name) for output, name in zip(outputs, names) if output is not None]
+    if not done:
+        yield rows, None
+        return
+    # The zip is cached too, keyed by its content
+    digest = hashlib.sha256()
+    for output, name in done:
+        digest.update(f"{output}\0{name}\0".encode())
+    archive, _ = output_cache.get_or_create(digest.hexdigest(), "stegano_hidden.zip",
+                                            lambda target: write_zip(target, *zip(*done)))
+    # Files with the same content share one cached output
+    yield rows, [archive] + list(dict.fromkeys(output for output, _ in done))
+
+def reveal_files(files, seed):
+    """Extract the message of every uploaded file; streams the result table."""
+    paths = [upload_path(f) for f in files or []]
+
+    def reveal(path, index, timer):
+        message = reveal_message(path, seed, timer)
+        return message if message is not None else ""
+
+    yield from run_batch("reveal", paths, reveal)
+
+def event_options():
+    """Queue options for the batch events."""
+    if gradio_version() >= (4, 0):
+        return {"concurrency_limit": BATCH_CONCURRENCY}
+    return {}
+
 def stegano_decoded():
     return "Decoded message will appear here."
 
@@ -298,6 +268,7 @@ Image Quality: The tool is designed to minimize the impact on image quality, but
     return read_me
 
 def process_file(file_obj):
+    import gradio as gr
     # Get the original file path
     file_path = file_obj.name
     print(f"Original file path: {file_path}")
@@ -307,46 +278,85 @@ def process_file(file_obj):
     return gr.Image(value=file_obj.name)
 
 def about_tab():
+    import gradio as gr
     gr.Markdown("## 🕵️‍♂️ Stegano 🕵️‍♂️")
     gr.Markdown(format_license_for_gradio)
     gr.Markdown(read_me_for_gradio)
 
 def read_stegano_tab():
+    import gradio as gr
     with gr.Column():
         with gr.Row():
             # image = gr.Textbox(label="Image Path")  # Using Textbox to accept image path
-            if gradio_version >= (4, 0):  # version where "filepath" is supported
-                image = gr.File(type="filepath", label="Image Path")
+            if gradio_version() >= (4, 0):  # version where "filepath" is supported
+                image = gr.File(type="filepath", label="Image Path", file_count="multiple")
             else:
-                image = gr.File(type="file", label="Image Path")
+                image = gr.File(type="file", label="Image Path", file_count="multiple")
             #image = gr.File(type="filepath", label="Image Path")
-            decoded_message = gr.Textbox(label="Decoded Message")
             seed = gr.Number(label="Seed", value=0)
             button = gr.Button("Reveal", variant='primary')
-            button.click(image_analysis, inputs=[image,seed], outputs=[decoded_message])
+        results = gr.Dataframe(headers=["File", "Status", "Decoded Message", "Seconds"],
+                               datatype=["str", "str", "str", "str"], interactive=False, wrap=True)
+        button.click(reveal_files, inputs=[image, seed], outputs=[results], **event_options())
+        decoded_message = gr.Textbox(label="Seed Scan")
+        with gr.Row():
+            seeds = gr.Textbox(label="Seeds to scan", placeholder="0-9999, 31337")
+            scan_button = gr.Button("Scan seeds")
+            scan_button.click(scan_seeds, inputs=[image, seeds], outputs=[decoded_message])
 
 def write_stegano_tab():
+    import gradio as gr
     with gr.Column():
         with gr.Row():
-            if gradio_version >= (4, 0):  # version where "filepath" is supported
-                image = gr.File(type="filepath", label="Upload File")
+            if gradio_version() >= (4, 0):  # version where "filepath" is supported
+                image = gr.File(type="filepath", label="Upload Files", file_count="multiple")
             else:
-                image = gr.File(type="file", label="Upload File")
+                image = gr.File(type="file", label="Upload Files", file_count="multiple")
             #image = gr.File(type="filepath", label="Upload File")
             message = gr.Textbox(lines=5, placeholder="Enter the message to embed")
             seed = gr.Number(label="Seed", value=0)
-            download_button = gr.File(label="Download Image with Embedded Message")
+            download_button = gr.File(label="Download Images with Embedded Message (all files as zip first)",
+                                      file_count="multiple")
             button = gr.Button("Embed Message", variant='primary')
-            
-            # Trigger the embedding and provide a download link
-            button.click(encode_image, inputs=[image, message, seed], outputs=download_button)
+        results = gr.Dataframe(headers=["File", "Status", "Output", "Seconds"],
+                               datatype=["str", "str", "str", "str"], interactive=False)
+
+        # Trigger the embedding, stream the progress and provide the downloads
+        button.click(hide_files, inputs=[image, message, seed], outputs=[results, download_button], **event_options())
+
+def dump_timings():
+    """Write the timing summary next to the WebUI log and return its path."""
+    path = os.path.abspath("stegano_timings.json")
+    timing.stats.dump(path)
+    return timing.stats.format_table() + f"\n\nWritten to {path}"
+
+def reset_timings():
+    timing.stats.reset()
+    return timing.stats.format_table()
+
+def timing_tab():
+    import gradio as gr
+    with gr.Column():
+        gr.Markdown("Stage timings of the save hook and the Hide/Reveal tabs. "
+                    "Enable them with STEGANO_TIMING=1 or the \"Log stage timings\" option of the postprocessing script.")
+        table = gr.Textbox(label="Timings (ms)", lines=12, value=timing.stats.format_table)
+        with gr.Row():
+            refresh = gr.Button("Refresh")
+            reset = gr.Button("Reset")
+            dump = gr.Button("Dump to JSON")
+        refresh.click(timing.stats.format_table, inputs=[], outputs=[table])
+        reset.click(reset_timings, inputs=[], outputs=[table])
+        dump.click(dump_timings, inputs=[], outputs=[table])
 
 def add_tab():
+    import gradio as gr
     with gr.Blocks(analytics_enabled=False) as ui:
         with gr.Tab("Hide"):
             write_stegano_tab()
         with gr.Tab("Reveal"):
             read_stegano_tab()
+        with gr.Tab("Timing"):
+            timing_tab()
         with gr.Tab("About"):
             about_tab()
 